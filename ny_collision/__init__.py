@@ -0,0 +1,14 @@
+from ny_collision.adjacency import Adjacency
+from ny_collision.broadphase import BoxTree
+from ny_collision.buffers import DeformBuffers
+from ny_collision.cache import ColliderCache, shared_cache
+from ny_collision.core import (MeshCollider, active_vertices, deform, face_edges, normal_indices, transform_moved,
+                               transform_points, triangulate, vertex_normals)
+from ny_collision.incremental import IncrementalDeformer
+from ny_collision.parallel import map_chunks, worker_count
+from ny_collision.plastic import Checkpoints, OffsetBuffer, PlasticDeformer
+from ny_collision.primitives import BoxCollider, CapsuleCollider, PlaneCollider, SphereCollider, primitive_collider
+from ny_collision.proxy import ProxyCollider
+from ny_collision.ramp import RampTable
+from ny_collision.sdf import RigidCollider, SignedDistanceField
+from ny_collision.timing import StageLog, StageTimer
@@ -0,0 +1,61 @@
+import numpy as np
+
+from ny_collision.core import copy_points, face_edges
+from ny_collision.parallel import run, split
+
+#Vertex adjacency in compressed sparse row form. It only depends on the
+#topology, so callers build it once and keep it until the topology changes.
+
+
+class Adjacency(object):
+    def __init__(self, edges, vertexCount):
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        cols = np.concatenate((edges[:, 1], edges[:, 0]))
+        order = np.argsort(rows, kind="stable")
+        self.vertexCount = vertexCount
+        self.indices = cols[order]
+        self.counts = np.bincount(rows, minlength=vertexCount)
+        self.indptr = np.zeros(vertexCount + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.indptr[1:])
+
+    @classmethod
+    def from_faces(cls, faceCounts, faceConnects, vertexCount):
+        return cls(face_edges(faceCounts, faceConnects), vertexCount)
+
+    def neighbours(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def restrict(self, rows):
+        #row and column ids of the nonzeros that belong to the given rows
+        counts = self.counts[rows]
+        rowIds = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return rowIds, self.indices[np.repeat(self.indptr[rows], counts) + offsets]
+
+    def smooth(self, points, mask, iterations, envelope=1.0, workers=1, out=None, rest=None):
+        #laplacian smoothing of the masked vertices, the rest stay where they are.
+        #Like the original deformer, the neighbours are averaged from rest, the
+        #undeformed points, and not from the smoothed ones. Without rest they are
+        #the points before smoothing. The points keep their precision, out may be
+        #the points themselves
+        rest = np.array(points) if rest is None else rest
+        points = copy_points(points, out)
+        rows = np.flatnonzero(mask & (self.counts > 0))
+        if not len(rows) or not iterations:
+            return points
+        #every chunk of rows keeps its own slice of the matrix
+        chunks = [(chunk,) + self.restrict(chunk) + (1.0 / self.counts[chunk],) for chunk in split(rows, workers)]
+
+        def chunk_average(part):
+            chunk, rowIds, cols, inverseCounts = part
+            average = np.empty((len(chunk), 3))
+            for axis in range(3):
+                average[:, axis] = np.bincount(rowIds, rest[cols, axis], len(chunk)) * inverseCounts
+            return average
+
+        #the neighbours don't move, their average is the same for every iteration
+        average = np.concatenate(run(chunk_average, chunks, workers))
+        for smoothIt in range(iterations):
+            points[rows] -= (points[rows] - average) * 0.5 * envelope
+        return points
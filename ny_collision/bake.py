@@ -0,0 +1,259 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+
+import numpy as np
+
+from ny_collision import core
+from ny_collision.adjacency import Adjacency
+from ny_collision.buffers import PRECISIONS, DeformBuffers
+from ny_collision.incremental import IncrementalDeformer
+from ny_collision.plastic import PlasticDeformer
+from ny_collision.proxy import ProxyCollider
+from ny_collision.ramp import RAMP_INTERPOLATIONS, RAMP_TOLERANCE, RampTable, ramp_curve
+
+#Headless bake, no Maya needed. Mesh and collider sequences are read one frame
+#at a time from OBJ files or from .npy point caches, the deformed points are
+#written into a memory mapped float32 .npy cache of shape (frames, points, 3).
+#
+#  python -m ny_collision.bake shirt.####.obj -c body.####.obj -o shirt.npy -f 1 120
+#
+#A path with a run of # is a numbered sequence, a path without one is the same
+#every frame. A .npy point cache holds (frames, points, 3) starting at the first
+#baked frame and takes its topology from the .obj of the same name next to it.
+
+FRAME_TOKEN = re.compile(r"#+")
+
+#the bulgeRamp entries a new node starts with, all of them splines
+BULGE_RAMP = tuple((position, value, "spline")
+                   for position, value in zip(core.BULGE_RAMP_POSITIONS, core.BULGE_RAMP_VALUES))
+
+
+def read_obj(path):
+    #points, face counts and face connects of an OBJ file, everything else is ignored
+    points = []
+    faceCounts = []
+    faceConnects = []
+    with open(path) as objFile:
+        for line in objFile:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "v":
+                points.append([float(value) for value in fields[1:4]])
+            elif fields[0] == "f":
+                #vertex/uv/normal, negative ids count back from the last vertex
+                ids = [int(field.split("/")[0]) for field in fields[1:]]
+                faceConnects.extend(index - 1 if index > 0 else len(points) + index for index in ids)
+                faceCounts.append(len(ids))
+    return (np.array(points, dtype=np.float64).reshape(-1, 3), np.array(faceCounts, dtype=np.int64),
+            np.array(faceConnects, dtype=np.int64))
+
+
+def frame_path(pattern, frame):
+    #the # run is replaced by the zero padded frame number
+    return FRAME_TOKEN.sub(lambda match: str(frame).zfill(len(match.group())), pattern, count=1)
+
+
+class MeshSequence(object):
+    def __init__(self, path, firstFrame=1):
+        self.path = path
+        self.cache = None
+        if path.endswith(".npy"):
+            #only the frames that are read are paged in
+            self.cache = np.load(path, mmap_mode="r")
+            points, self.faceCounts, self.faceConnects = read_obj(os.path.splitext(path)[0] + ".obj")
+            if self.cache.ndim != 3 or self.cache.shape[1:] != points.shape:
+                raise ValueError("{} doesn't match the topology of its .obj".format(path))
+        else:
+            points, self.faceCounts, self.faceConnects = read_obj(frame_path(path, firstFrame))
+        self.pointCount = len(points)
+        self.still = points if self.cache is None and not FRAME_TOKEN.search(path) else None
+
+    def points(self, frame, index):
+        #points of a frame, index counts from the first baked frame
+        if self.cache is not None:
+            return np.asarray(self.cache[index], dtype=np.float64)
+        if self.still is not None:
+            return self.still
+        points = read_obj(frame_path(self.path, frame))[0]
+        if len(points) != self.pointCount:
+            raise ValueError("{} changes its point count at frame {}".format(self.path, frame))
+        return points
+
+
+class Baker(object):
+    #deforms one frame at a time, keeps the topology work between frames
+    def __init__(self, meshPath, colliderPaths, firstFrame=1, weightsPath=None, envelope=1.0,
+                 bulgeDistance=0.0, bulgeStrength=1.0, smoothIterations=0, incremental=False, workers=1,
+                 plastic=False, proxyError=0.0, exactPushout=False, precision=PRECISIONS[0],
+                 bulgeRamp=BULGE_RAMP, bulgeRampTolerance=RAMP_TOLERANCE):
+        self.mesh = MeshSequence(meshPath, firstFrame)
+        self.colliders = [MeshSequence(path, firstFrame) for path in colliderPaths]
+        self.colliderTriangles = [core.triangulate(collider.faceCounts, collider.faceConnects)
+                                  for collider in self.colliders]
+        self.colliderCache = [None for collider in self.colliders]
+        self.proxy = (proxyError, exactPushout)
+        self.adjacency = Adjacency.from_faces(self.mesh.faceCounts, self.mesh.faceConnects, self.mesh.pointCount)
+        self.normalIndices = core.normal_indices(self.mesh.faceCounts, self.mesh.faceConnects)
+        self.buffers = DeformBuffers()
+        self.buffers.resize(self.mesh.pointCount, precision)
+        self.weights = np.ones(self.mesh.pointCount) if weightsPath is None else np.load(weightsPath)
+        if len(self.weights) != self.mesh.pointCount:
+            raise ValueError("{} doesn't have a weight for every point".format(weightsPath))
+        self.weights = self.weights.astype(self.buffers.dtype)
+        self.active = core.active_vertices(self.weights)
+        #the ramp is sampled into the same lookup table the node uses
+        bulgeTable = RampTable(bulgeRampTolerance)
+        bulgeTable.update(tuple(bulgeRamp), ramp_curve(bulgeRamp))
+        self.settings = (envelope, bulgeDistance, bulgeStrength, bulgeTable, smoothIterations)
+        self.deformer = IncrementalDeformer().deform if incremental else core.deform
+        #plastic frames build on the frame before, they are baked in order
+        self.plastic = PlasticDeformer(firstFrame) if plastic else None
+        self.stateless = not incremental and not plastic
+        self.workers = workers
+
+    def frame(self, frame, index):
+        points = core.copy_points(self.mesh.points(frame, index), self.buffers.points)
+        normals = core.vertex_normals(points, self.mesh.faceCounts, self.mesh.faceConnects, self.buffers.normals,
+                                      self.normalIndices)
+        colliders = []
+        for col, sequence in enumerate(self.colliders):
+            colPoints = sequence.points(frame, index)
+            if self.colliderCache[col] is None and self.proxy[0] > 0:
+                self.colliderCache[col] = ProxyCollider(colPoints, self.colliderTriangles[col], *self.proxy)
+            elif self.colliderCache[col] is None:
+                self.colliderCache[col] = core.MeshCollider(colPoints, self.colliderTriangles[col])
+            else:
+                self.colliderCache[col].update(colPoints)
+            colliders.append(self.colliderCache[col])
+        envelope, bulgeDistance, bulgeStrength, bulgeRamp, smoothIterations = self.settings
+        result = self.deformer(points, normals, self.weights, colliders, envelope, bulgeDistance,
+                               bulgeStrength, bulgeRamp, smoothIterations, self.adjacency, self.active,
+                               self.workers, None, self.buffers.result)
+        if self.plastic is not None:
+            result = self.plastic.deform(frame, points, result, out=result)
+        return result.astype(np.float32)
+
+
+#per process state of the frame pool
+_worker = {}
+
+
+def _start_worker(bakerArgs, bakerKwargs, outputPath):
+    _worker["baker"] = Baker(*bakerArgs, **bakerKwargs)
+    _worker["output"] = np.load(outputPath, mmap_mode="r+")
+
+
+def _bake_frame(job):
+    frame, index = job
+    _worker["output"][index] = _worker["baker"].frame(frame, index)
+    _worker["output"].flush()
+    return index
+
+
+def bake(meshPath, colliderPaths, outputPath, start=None, end=None, weightsPath=None, envelope=1.0,
+         bulgeDistance=0.0, bulgeStrength=1.0, smoothIterations=0, incremental=False, workers=1,
+         processes=1, log=None, plastic=False, proxyError=0.0, exactPushout=False, precision=PRECISIONS[0],
+         bulgeRamp=BULGE_RAMP, bulgeRampTolerance=RAMP_TOLERANCE):
+    #bakes frames start to end (inclusive) into outputPath, returns the frame count.
+    #bulgeRamp holds (position, value, interpolation) entries like the node's bulgeRamp
+    counts = [len(np.load(path, mmap_mode="r")) for path in [meshPath] + list(colliderPaths)
+              if path.endswith(".npy")]
+    if start is None:
+        start = 1
+    if end is None:
+        if not counts:
+            raise ValueError("the frame range is needed when no input is a point cache")
+        end = start + min(counts) - 1
+    jobs = [(frame, index) for index, frame in enumerate(range(start, end + 1))]
+    if counts and len(jobs) > min(counts):
+        raise ValueError("the point caches only have {} frames".format(min(counts)))
+
+    bakerArgs = (meshPath, colliderPaths, start, weightsPath)
+    bakerKwargs = {"envelope": envelope, "bulgeDistance": bulgeDistance, "bulgeStrength": bulgeStrength,
+                   "smoothIterations": smoothIterations, "incremental": incremental, "workers": workers, "plastic": plastic,
+                   "proxyError": proxyError, "exactPushout": exactPushout,
+                   "precision": precision, "bulgeRamp": tuple(bulgeRamp), "bulgeRampTolerance": bulgeRampTolerance}
+    baker = Baker(*bakerArgs, **bakerKwargs)
+
+    output = np.lib.format.open_memmap(outputPath, mode="w+", dtype=np.float32,
+                                       shape=(len(jobs), baker.mesh.pointCount, 3))
+    processes = processes if processes > 0 else (os.cpu_count() or 1)
+    if baker.stateless and processes > 1 and len(jobs) > 1:
+        #frames don't depend on each other, every process writes its own into the cache
+        del output
+        with multiprocessing.Pool(processes, _start_worker, (bakerArgs, bakerKwargs, outputPath)) as pool:
+            for index in pool.imap_unordered(_bake_frame, jobs):
+                if log:
+                    log("baked frame {}".format(jobs[index][0]))
+    else:
+        for frame, index in jobs:
+            output[index] = baker.frame(frame, index)
+            if log:
+                log("baked frame {}".format(frame))
+        output.flush()
+    return len(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ny_collision.bake",
+                                     description="Bakes the collision deformation of a mesh sequence.")
+    parser.add_argument("mesh", help="deforming mesh, an OBJ, a numbered OBJ sequence (#) or a .npy point cache")
+    parser.add_argument("-c", "--collider", action="append", default=[], help="collider, same formats as the mesh")
+    parser.add_argument("-o", "--output", required=True, help="float32 .npy point cache to write")
+    parser.add_argument("-f", "--frames", nargs=2, type=int, metavar=("START", "END"),
+                        help="frame range, by default every frame of the point caches")
+    parser.add_argument("-w", "--weights", help=".npy file with a weight for every point")
+    parser.add_argument("--envelope", type=float, default=1.0)
+    parser.add_argument("--bulge-distance", type=float, default=0.0)
+    parser.add_argument("--bulge-strength", type=float, default=1.0)
+    parser.add_argument("--bulge-ramp", nargs=3, action="append", metavar=("POSITION", "VALUE", "INTERPOLATION"),
+                        help="bulgeRamp entry, repeat it for every entry. The interpolation is one of {}, "
+                             "by default the node's own ramp is used".format(", ".join(RAMP_INTERPOLATIONS)))
+    parser.add_argument("--bulge-ramp-tolerance", type=float, default=RAMP_TOLERANCE,
+                        help="largest error of the sampled bulge ramp")
+    parser.add_argument("--smooth", type=int, default=0, help="smoothing iterations")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse the last frame's queries, frames are baked in order on one process")
+    parser.add_argument("--plastic", action="store_true",
+                        help="dents stay after the collider leaves, frames are baked in order on one process")
+    parser.add_argument("--proxy-error", type=float, default=0.0,
+                        help="largest error of the decimated collider proxies, 0 queries the colliders themselves")
+    parser.add_argument("--exact-pushout", action="store_true",
+                        help="the push-out asks the full collider instead of the proxy")
+    parser.add_argument("--precision", choices=PRECISIONS, default=PRECISIONS[0],
+                        help="precision of the deformation, the cache is float32 either way")
+    parser.add_argument("--workers", type=int, default=1, help="threads per frame, 0 uses every core")
+    parser.add_argument("--processes", type=int, default=0, help="frames baked at once, 0 uses every core")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    start, end = args.frames if args.frames else (None, None)
+    log = None if args.quiet else (lambda message: sys.stderr.write(message + "\n"))
+    bulgeRamp = BULGE_RAMP
+    if args.bulge_ramp:
+        try:
+            bulgeRamp = tuple((float(position), float(value), interpolation)
+                              for position, value, interpolation in args.bulge_ramp)
+        except ValueError:
+            parser.error("bulge ramp positions and values have to be numbers")
+        for entry in bulgeRamp:
+            if entry[2] not in RAMP_INTERPOLATIONS:
+                parser.error("unknown bulge ramp interpolation: {}".format(entry[2]))
+    try:
+        count = bake(args.mesh, args.collider, args.output, start, end, args.weights, args.envelope,
+                     args.bulge_distance, args.bulge_strength, args.smooth, args.incremental, args.workers,
+                     args.processes, log, args.plastic, args.proxy_error, args.exact_pushout,
+                     args.precision, bulgeRamp, args.bulge_ramp_tolerance)
+    except (IOError, ValueError) as error:
+        parser.error(str(error))
+    if log:
+        log("wrote {} frames to {}".format(count, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
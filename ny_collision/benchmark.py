@@ -0,0 +1,202 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from ny_collision import core
+from ny_collision.adjacency import Adjacency
+from ny_collision.buffers import PRECISIONS, DeformBuffers
+from ny_collision.timing import STAGES, StageTimer
+
+#Benchmarks of the deformation kernel on synthetic meshes, no Maya needed.
+#Every scenario presses a few sphere colliders into a grid or a sphere mesh and
+#times each stage, results are JSON and can be checked against a baseline.
+#
+#  python -m ny_collision.benchmark --save-baseline baseline.json
+#  python -m ny_collision.benchmark --baseline baseline.json
+
+#(mesh, vertices, colliders, contact ratio, bulge distance, smoothing iterations)
+QUICK = (
+    ("grid", 1000, 1, 0.10, 0.10, 1),
+    ("grid", 10000, 5, 0.10, 0.10, 2),
+    ("sphere", 10000, 20, 0.05, 0.05, 0),
+    ("sphere", 10000, 1, 0.25, 0.20, 3),
+    ("grid", 100000, 5, 0.10, 0.10, 2),
+)
+FULL = QUICK + (
+    ("grid", 100000, 20, 0.25, 0.20, 3),
+    ("sphere", 100000, 20, 0.05, 0.10, 1),
+    ("grid", 1000000, 20, 0.10, 0.10, 2),
+    ("sphere", 1000000, 1, 0.25, 0.20, 3),
+)
+PRESETS = {"quick": QUICK, "full": FULL}
+
+#segments around the sphere colliders
+COLLIDER_SEGMENTS = 32
+
+#a stage only counts as slower when it is slower by both amounts
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_SECONDS = 0.002
+
+
+def grid_mesh(count, size=2.0):
+    #square grid on the xy plane with about count vertices
+    side = max(2, int(round(np.sqrt(count))))
+    axis = np.linspace(-size * 0.5, size * 0.5, side)
+    x, y = np.meshgrid(axis, axis, indexing="ij")
+    points = np.stack((x.ravel(), y.ravel(), np.zeros(side * side)), axis=-1)
+    ids = np.arange(side * side).reshape(side, side)
+    quads = np.stack((ids[:-1, :-1], ids[1:, :-1], ids[1:, 1:], ids[:-1, 1:]), axis=-1).reshape(-1, 4)
+    return points, np.full(len(quads), 4, dtype=np.int64), quads.ravel()
+
+
+def sphere_mesh(count, radius=1.0, center=(0.0, 0.0, 0.0)):
+    #uv sphere with about count vertices, quads with triangle fans at the poles
+    rings = max(3, int(round(np.sqrt(count * 0.5))))
+    segments = rings * 2
+    theta = np.pi * np.arange(1, rings) / rings
+    phi = 2 * np.pi * np.arange(segments) / segments
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    points = np.stack((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)), axis=-1)
+    points = np.concatenate((points.reshape(-1, 3), [[0.0, 0.0, 1.0], [0.0, 0.0, -1.0]])) * radius + center
+    top = len(points) - 2
+    bottom = len(points) - 1
+    ids = np.arange((rings - 1) * segments).reshape(rings - 1, segments)
+    following = np.roll(ids, -1, axis=1)
+    quads = np.stack((ids[:-1], ids[1:], following[1:], following[:-1]), axis=-1).reshape(-1, 4)
+    caps = np.concatenate((np.stack((np.full(segments, top), ids[0], following[0]), axis=-1),
+                           np.stack((following[-1], ids[-1], np.full(segments, bottom)), axis=-1)))
+    faceCounts = np.concatenate((np.full(len(quads), 4), np.full(len(caps), 3))).astype(np.int64)
+    return points, faceCounts, np.concatenate((quads.ravel(), caps.ravel())).astype(np.int64)
+
+
+def scenario_name(scenario):
+    mesh, vertices, colliders, contact, bulge, smooth = scenario
+    return "{}-{}v-{}c-{}p-b{}-s{}".format(mesh, vertices, colliders, int(round(contact * 100)), bulge, smooth)
+
+
+def build_scenario(scenario, seed=0):
+    #mesh arrays and colliders pressing about the contact ratio of its surface
+    mesh, vertices, colliderCount, contact, bulge, smooth = scenario
+    if mesh == "grid":
+        points, faceCounts, faceConnects = grid_mesh(vertices)
+        area = 4.0
+    else:
+        points, faceCounts, faceConnects = sphere_mesh(vertices)
+        area = 4.0 * np.pi
+    normals = core.vertex_normals(points, faceCounts, faceConnects)
+
+    #every collider dents a disc of the surface, half as deep as it is wide
+    rng = np.random.RandomState(seed)
+    disc = np.sqrt(contact * area / (colliderCount * np.pi))
+    depth = disc * 0.5
+    radius = (disc * disc + depth * depth) / (2 * depth)
+    sphere = sphere_mesh(COLLIDER_SEGMENTS * COLLIDER_SEGMENTS // 2)
+    triangles = core.triangulate(sphere[1], sphere[2])
+    colliders = []
+    for index in rng.choice(len(points), colliderCount, replace=False):
+        center = points[index] + normals[index] * (radius - depth)
+        colliders.append(core.MeshCollider(sphere[0] * radius + center, triangles))
+    adjacency = Adjacency.from_faces(faceCounts, faceConnects, len(points))
+    return points, normals, np.ones(len(points)), colliders, adjacency
+
+
+def run_scenario(scenario, repeats=3, workers=1, precision=PRECISIONS[0]):
+    #median time of every stage over the repeats
+    bulge, smooth = scenario[4], scenario[5]
+    points, normals, weights, colliders, adjacency = build_scenario(scenario)
+    #the node reads the float32 mesh points into its buffers and writes the result back into them
+    matrix = np.eye(4)
+    output = points.astype(np.float32)
+    buffers = DeformBuffers()
+    buffers.resize(len(points), precision)
+    normals = normals.astype(buffers.dtype)
+    weights = weights.astype(buffers.dtype)
+    times = []
+    for repeat in range(repeats):
+        timer = StageTimer()
+        core.transform_points(output, matrix, buffers.points)
+        result = core.deform(buffers.points, normals, weights, colliders, 1.0, bulge, 1.0, core.bulge_ramp,
+                             smooth, adjacency, None, workers, timer, buffers.result)
+        with timer.stage("writeback"):
+            core.transform_moved(buffers.points, result, output, np.linalg.inv(matrix))
+        output[:] = points
+        times.append(timer.times)
+    stages = dict((name, float(np.median([entry[name] for entry in times]))) for name in STAGES)
+    return {"name": scenario_name(scenario), "vertices": len(points), "colliders": len(colliders),
+            "contact": scenario[3], "bulgeDistance": bulge, "smoothIterations": smooth,
+            "precision": precision, "stages": stages, "counts": dict(timer.counts), "total": sum(stages.values())}
+
+
+def run(scenarios, repeats=3, workers=1, log=None, precision=PRECISIONS[0]):
+    results = []
+    for scenario in scenarios:
+        result = run_scenario(scenario, repeats, workers, precision)
+        results.append(result)
+        if log:
+            log("{:<36} {}  total {:.4f}s".format(result["name"], " ".join(
+                "{} {:.4f}".format(name, result["stages"][name]) for name in STAGES), result["total"]))
+    return {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "processor": platform.processor(),
+            "workers": workers, "repeats": repeats, "results": results}
+
+
+def regressions(report, baseline, tolerance=REGRESSION_TOLERANCE, seconds=REGRESSION_SECONDS):
+    #(scenario, stage, baseline seconds, seconds) of every stage slower than the baseline
+    previous = dict((result["name"], result) for result in baseline["results"])
+    slower = []
+    for result in report["results"]:
+        if result["name"] not in previous:
+            continue
+        for name, current in result["stages"].items():
+            before = previous[result["name"]]["stages"].get(name, 0.0)
+            if current > before * (1.0 + tolerance) and current - before > seconds:
+                slower.append((result["name"], name, before, current))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ny_collision.benchmark",
+                                     description="Times every stage of the deformation on synthetic meshes.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick",
+                        help="quick runs up to 100k vertices, full up to 1M")
+    parser.add_argument("--filter", default="", help="only the scenarios whose name contains this")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="threads, 0 uses every core")
+    parser.add_argument("--precision", choices=PRECISIONS, default=PRECISIONS[0],
+                        help="precision of the deformation buffers")
+    parser.add_argument("-o", "--output", help="JSON results file, printed when not given")
+    parser.add_argument("--baseline", help="JSON results to compare against, slower stages fail the run")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed slowdown of a stage as a fraction of its baseline")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenarios = [scenario for scenario in PRESETS[args.preset] if args.filter in scenario_name(scenario)]
+    log = None if args.quiet else (lambda message: sys.stderr.write(message + "\n"))
+    report = run(scenarios, args.repeats, args.workers, log, args.precision)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as resultFile:
+                resultFile.write(text + "\n")
+    if not args.output:
+        sys.stdout.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            slower = regressions(report, json.load(baselineFile), args.tolerance)
+        for name, stage, before, current in slower:
+            sys.stderr.write("regression {} {}: {:.4f}s -> {:.4f}s\n".format(name, stage, before, current))
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
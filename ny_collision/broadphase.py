@@ -0,0 +1,75 @@
+import numpy as np
+
+from ny_collision.geometry import float_array
+
+#Top level tree over the colliders' bounding boxes. It routes every point only
+#to the colliders whose (optionally expanded) box contains it.
+
+
+class BoxTree(object):
+    def __init__(self, boxMin, boxMax):
+        boxMin = np.asarray(boxMin, dtype=np.float64).reshape(-1, 3)
+        boxMax = np.asarray(boxMax, dtype=np.float64).reshape(-1, 3)
+        #unbounded boxes, like the half space of a plane, get finite centers to be sorted by
+        with np.errstate(invalid="ignore"):
+            centers = np.nan_to_num((boxMin + boxMax) * 0.5, nan=0.0)
+        children = []
+        leafBox = []
+        nodeMin = []
+        nodeMax = []
+        stack = [(np.arange(len(boxMin)), -1, 0)]
+        while stack:
+            boxes, parent, side = stack.pop()
+            node = len(children)
+            children.append([-1, -1])
+            nodeMin.append(boxMin[boxes].min(axis=0) if len(boxes) else np.full(3, np.inf))
+            nodeMax.append(boxMax[boxes].max(axis=0) if len(boxes) else np.full(3, -np.inf))
+            leafBox.append(boxes[0] if len(boxes) == 1 else -1)
+            if parent >= 0:
+                children[parent][side] = node
+            if len(boxes) <= 1:
+                continue
+            axis = int((centers[boxes].max(axis=0) - centers[boxes].min(axis=0)).argmax())
+            boxes = boxes[np.argsort(centers[boxes, axis], kind="stable")]
+            middle = len(boxes) // 2
+            stack.append((boxes[middle:], node, 1))
+            stack.append((boxes[:middle], node, 0))
+        self.children = np.array(children, dtype=np.int64).reshape(-1, 2)
+        self.leafBox = np.array(leafBox, dtype=np.int64)
+        self.nodeMin = np.array(nodeMin).reshape(-1, 3)
+        self.nodeMax = np.array(nodeMax).reshape(-1, 3)
+        self.boxCount = len(boxMin)
+
+    @classmethod
+    def from_colliders(cls, colliders):
+        bounds = [collider.bounds() for collider in colliders]
+        return cls([bound[0] for bound in bounds], [bound[1] for bound in bounds])
+
+    def overlaps(self, points, margin=0.0, boxes=None):
+        #(point id, box id) pairs, boxes optionally limits the result to a subset
+        points = float_array(points)
+        pairQueries = []
+        pairBoxes = []
+        queries = np.arange(len(points))
+        nodes = np.zeros(len(points), dtype=np.int64)
+        if not self.boxCount:
+            queries = queries[:0]
+        while len(queries):
+            inside = ((points[queries] >= self.nodeMin[nodes] - margin) &
+                      (points[queries] <= self.nodeMax[nodes] + margin)).all(axis=1)
+            queries = queries[inside]
+            nodes = nodes[inside]
+            leaf = self.children[nodes, 0] < 0
+            pairQueries.append(queries[leaf])
+            pairBoxes.append(self.leafBox[nodes[leaf]])
+            queries = np.tile(queries[~leaf], 2)
+            nodes = self.children[nodes[~leaf]].T.ravel()
+        if not pairQueries:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pairQueries = np.concatenate(pairQueries)
+        pairBoxes = np.concatenate(pairBoxes)
+        if boxes is not None:
+            keep = np.isin(pairBoxes, boxes)
+            pairQueries = pairQueries[keep]
+            pairBoxes = pairBoxes[keep]
+        return pairQueries, pairBoxes
@@ -0,0 +1,31 @@
+import numpy as np
+
+#Arrays a deformer keeps between evaluations. They are only made again when
+#the point count or the precision changes, so playback doesn't allocate full
+#size arrays for the points, the normals or the result.
+
+PRECISIONS = ("float32", "float64")
+
+
+class DeformBuffers(object):
+    def __init__(self):
+        self.count = None
+        self.dtype = None
+        self.allocations = 0
+
+    def resize(self, count, precision=PRECISIONS[0]):
+        #true when the buffers had to be made again
+        dtype = np.dtype(precision)
+        if count == self.count and dtype == self.dtype:
+            return False
+        self.count = count
+        self.dtype = dtype
+        self.points = np.empty((count, 3), dtype=dtype)
+        self.normals = np.empty((count, 3), dtype=dtype)
+        self.result = np.empty((count, 3), dtype=dtype)
+        self.allocations += 1
+        return True
+
+    @property
+    def nbytes(self):
+        return 0 if self.count is None else self.points.nbytes + self.normals.nbytes + self.result.nbytes
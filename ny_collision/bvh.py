@@ -0,0 +1,207 @@
+import numpy as np
+
+from ny_collision.geometry import (RAY_TOLERANCE, _dot, _first_per_group, closest_point_on_triangles,
+                                   ray_triangle_params)
+
+#Bounding volume hierarchy over a triangle mesh. The tree layout only depends on
+#the topology and is built once, moving points only refit the boxes.
+
+LEAF_SIZE = 8
+
+#queries traversed together, keeps the frontier arrays small
+QUERY_BLOCK = 4096
+
+
+def box_distance2(points, boxMin, boxMax):
+    delta = np.maximum(boxMin - points, 0.0) + np.maximum(points - boxMax, 0.0)
+    return _dot(delta, delta)
+
+
+class BVH(object):
+    def __init__(self, triangles, points, leafSize=LEAF_SIZE):
+        self.triangles = np.asarray(triangles, dtype=np.int64)
+        self.leafSize = leafSize
+        points = np.asarray(points, dtype=np.float64)
+        self._build(points[self.triangles].mean(axis=1))
+        self.refit(points)
+
+    def _build(self, centroids):
+        #median split on the longest centroid axis
+        children = []
+        depths = []
+        leafRanges = []
+        order = np.arange(len(self.triangles))
+        stack = [(0, len(order), 0, -1, 0)]
+        while stack:
+            start, end, depth, parent, side = stack.pop()
+            node = len(children)
+            children.append([-1, -1])
+            depths.append(depth)
+            leafRanges.append((start, end))
+            if parent >= 0:
+                children[parent][side] = node
+            if end - start <= self.leafSize:
+                continue
+            segment = order[start:end]
+            extent = centroids[segment].max(axis=0) - centroids[segment].min(axis=0)
+            axis = int(extent.argmax())
+            middle = (end - start) // 2
+            split = np.argpartition(centroids[segment, axis], middle)
+            order[start:end] = segment[split]
+            stack.append((start + middle, end, depth + 1, node, 1))
+            stack.append((start, start + middle, depth + 1, node, 0))
+
+        self.order = order
+        self.children = np.array(children, dtype=np.int64).reshape(-1, 2)
+        self.depths = np.array(depths, dtype=np.int64)
+        self.isLeaf = self.children[:, 0] < 0
+        self.nodeCount = len(self.children)
+
+        #leaf triangle table, short leaves are padded with their first triangle
+        self.leafRow = np.full(self.nodeCount, -1, dtype=np.int64)
+        leaves = np.flatnonzero(self.isLeaf)
+        self.leafRow[leaves] = np.arange(len(leaves))
+        table = np.zeros((len(leaves), self.leafSize), dtype=np.int64)
+        for row, leaf in enumerate(leaves):
+            start, end = leafRanges[leaf]
+            ids = order[start:end]
+            table[row] = ids[0] if len(ids) else 0
+            table[row, :len(ids)] = ids
+        self.leafTable = table
+        self.leaves = leaves
+        self.levels = [np.flatnonzero((self.depths == depth) & ~self.isLeaf)
+                       for depth in range(int(self.depths.max()) + 1)] if self.nodeCount else []
+
+    def refit(self, points):
+        #recompute the boxes bottom up, the tree layout is kept
+        self.points = np.asarray(points, dtype=np.float64)
+        corners = self.points[self.triangles]
+        self.corners = (corners[:, 0], corners[:, 1], corners[:, 2])
+        triMin = corners.min(axis=1)
+        triMax = corners.max(axis=1)
+        self.nodeMin = np.empty((self.nodeCount, 3))
+        self.nodeMax = np.empty((self.nodeCount, 3))
+        if not len(self.triangles):
+            self.nodeMin[:] = np.inf
+            self.nodeMax[:] = -np.inf
+            return
+        self.nodeMin[self.leaves] = triMin[self.leafTable].min(axis=1)
+        self.nodeMax[self.leaves] = triMax[self.leafTable].max(axis=1)
+        for nodes in reversed(self.levels):
+            left = self.children[nodes, 0]
+            right = self.children[nodes, 1]
+            self.nodeMin[nodes] = np.minimum(self.nodeMin[left], self.nodeMin[right])
+            self.nodeMax[nodes] = np.maximum(self.nodeMax[left], self.nodeMax[right])
+
+    def _leaf_corners(self, nodes):
+        tris = self.leafTable[self.leafRow[nodes]]
+        a, b, c = self.corners
+        return tris, a[tris], b[tris], c[tris]
+
+    def _closest_leaves(self, points, queries, nodes, best, closest, faces):
+        if not len(queries):
+            return
+        tris, a, b, c = self._leaf_corners(nodes)
+        candidates = closest_point_on_triangles(points[queries, None], a, b, c)
+        delta = candidates - points[queries, None]
+        distance = _dot(delta, delta)
+        column = distance.argmin(axis=1)
+        rows = np.arange(len(queries))
+        distance = distance[rows, column]
+        pick = _first_per_group(queries, distance)
+        pick = pick[distance[pick] < best[queries[pick]]]
+        winners = queries[pick]
+        best[winners] = distance[pick]
+        closest[winners] = candidates[rows[pick], column[pick]]
+        faces[winners] = tris[rows[pick], column[pick]]
+
+    def _closest_block(self, points, best, closest, faces):
+        count = len(points)
+        #greedy descent gives every query a tight first bound
+        node = np.zeros(count, dtype=np.int64)
+        inner = np.flatnonzero(~self.isLeaf[node])
+        while len(inner):
+            left = self.children[node[inner], 0]
+            right = self.children[node[inner], 1]
+            leftDistance = box_distance2(points[inner], self.nodeMin[left], self.nodeMax[left])
+            rightDistance = box_distance2(points[inner], self.nodeMin[right], self.nodeMax[right])
+            node[inner] = np.where(leftDistance <= rightDistance, left, right)
+            inner = inner[~self.isLeaf[node[inner]]]
+        self._closest_leaves(points, np.arange(count), node, best, closest, faces)
+
+        queries = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        while len(queries):
+            distance = box_distance2(points[queries], self.nodeMin[nodes], self.nodeMax[nodes])
+            keep = distance < best[queries]
+            queries = queries[keep]
+            nodes = nodes[keep]
+            leaf = self.isLeaf[nodes]
+            self._closest_leaves(points, queries[leaf], nodes[leaf], best, closest, faces)
+            queries = np.tile(queries[~leaf], 2)
+            nodes = self.children[nodes[~leaf]].T.ravel()
+
+    def closest_point(self, points):
+        #closest points, triangle ids and squared distances
+        points = np.asarray(points, dtype=np.float64)
+        count = len(points)
+        best = np.full(count, np.inf)
+        closest = np.full((count, 3), np.inf)
+        faces = np.zeros(count, dtype=np.int64)
+        if not len(self.triangles):
+            return closest, faces, best
+        for start in range(0, count, QUERY_BLOCK):
+            block = slice(start, min(start + QUERY_BLOCK, count))
+            self._closest_block(points[block], best[block], closest[block], faces[block])
+        return closest, faces, best
+
+    def _ray_block(self, origins, directions, tolerance, params, faces):
+        count = len(origins)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse = 1.0 / directions
+        queries = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        while len(queries):
+            #slab test
+            with np.errstate(invalid="ignore"):
+                first = (self.nodeMin[nodes] - origins[queries]) * inverse[queries]
+                second = (self.nodeMax[nodes] - origins[queries]) * inverse[queries]
+            first = np.nan_to_num(first, nan=-np.inf)
+            second = np.nan_to_num(second, nan=np.inf)
+            near = np.maximum(np.minimum(first, second).max(axis=1), 0.0)
+            far = np.minimum(np.maximum(first, second).min(axis=1), params[queries])
+            keep = near <= far + tolerance
+            queries = queries[keep]
+            nodes = nodes[keep]
+            leaf = self.isLeaf[nodes]
+            leafQueries = queries[leaf]
+            if len(leafQueries):
+                tris, a, b, c = self._leaf_corners(nodes[leaf])
+                hits = ray_triangle_params(origins[leafQueries, None], directions[leafQueries, None],
+                                           a, b, c, tolerance)
+                column = hits.argmin(axis=1)
+                rows = np.arange(len(leafQueries))
+                hits = hits[rows, column]
+                pick = _first_per_group(leafQueries, hits)
+                pick = pick[hits[pick] < params[leafQueries[pick]]]
+                params[leafQueries[pick]] = hits[pick]
+                faces[leafQueries[pick]] = tris[rows[pick], column[pick]]
+            queries = np.tile(queries[~leaf], 2)
+            nodes = self.children[nodes[~leaf]].T.ravel()
+
+    def ray_hits(self, origins, directions, maxParam, tolerance=RAY_TOLERANCE):
+        #nearest forward hit, params are inf where the ray misses
+        origins = np.asarray(origins, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.float64)
+        count = len(origins)
+        params = np.full(count, np.inf)
+        faces = np.full(count, -1, dtype=np.int64)
+        if not len(self.triangles):
+            return params, faces
+        bound = np.full(count, float(maxParam))
+        for start in range(0, count, QUERY_BLOCK):
+            block = slice(start, min(start + QUERY_BLOCK, count))
+            self._ray_block(origins[block], directions[block], tolerance, bound[block], faces[block])
+        hit = faces >= 0
+        params[hit] = bound[hit]
+        return params, faces
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+#Process wide cache of collider acceleration data. Every deformer node and
+#geometry index colliding with the same mesh shares one entry, the least
+#recently used entries are evicted once the memory budget is exceeded.
+
+CACHE_MEMORY = 512 * 1024 * 1024
+
+
+def array_bytes(value, seen=None):
+    #memory held by the numpy arrays an object reaches through its attributes
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(array_bytes(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sum(array_bytes(item, seen) for item in value.values())
+    if hasattr(value, "__dict__"):
+        return sum(array_bytes(item, seen) for item in vars(value).values())
+    return 0
+
+
+class ColliderCache(object):
+    def __init__(self, maxBytes=CACHE_MEMORY):
+        self.maxBytes = maxBytes
+        #entries are used by nodes evaluating in parallel
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, valid=None):
+        #the cached value, None on a miss or when valid rejects it
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and valid is not None and not valid(entry[0]):
+                self.discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self.lock:
+            self.discard(key)
+            size = array_bytes(value)
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            self._evict()
+            return value
+
+    def discard(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+
+    def remeasure(self, key):
+        #an entry's value grew or shrank after it was put
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            size = array_bytes(entry[0])
+            self.entries[key] = (entry[0], size)
+            self.nbytes += size - entry[1]
+            self._evict()
+
+    def resize(self, maxBytes):
+        with self.lock:
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def _evict(self):
+        #the newest entry is kept even when it alone is over the budget
+        while self.nbytes > self.maxBytes and len(self.entries) > 1:
+            key, (value, size) = self.entries.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.nbytes, "maxBytes": self.maxBytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+#the instance shared by every deformer node in the process
+shared_cache = ColliderCache()
@@ -0,0 +1,359 @@
+import numpy as np
+
+from ny_collision.broadphase import BoxTree
+from ny_collision.bvh import BVH
+from ny_collision.geometry import _dot, _first_per_group, _normalize, barycentric, corner_angles, float_array
+from ny_collision.parallel import map_chunks
+from ny_collision.timing import count, stage
+
+#AUTHOR = Nazmi Yazici
+#EMAIL = nazmiprinter@gmail.com
+#WEBSITE = nazmiprinter.com
+
+#Maya independent deformation kernel. Every array is world space, points and
+#normals are (N,3), weights are (N,). The Maya node only moves data in and out.
+#Points may be float32 or float64, the result has the same precision and can
+#be written into a buffer the caller keeps between evaluations.
+
+#default bulgeRamp entries, same as the ones the node creates on first evaluation
+BULGE_RAMP_POSITIONS = (0.000, 0.250, 1.000)
+BULGE_RAMP_VALUES = (0.000, 0.900, 0.000)
+
+#barycentric weight below which a closest point counts as on an edge or a vertex
+FEATURE_TOLERANCE = 1e-6
+
+
+def transform_points(points, matrix, out=None):
+    #maya matrices are row major, points are row vectors. With out the points
+    #are written into it, computed in the wider of the two precisions, and
+    #nothing else is allocated
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if out is None:
+        return np.dot(points, matrix[:3, :3]) + matrix[3, :3]
+    np.matmul(points, matrix[:3, :3].astype(np.result_type(points, out), copy=False), out=out)
+    out += matrix[3, :3]
+    return out
+
+
+def transform_moved(points, result, out, matrix=None):
+    #writes back only the result rows that differ from points, transformed in
+    #float64. Untouched rows keep out's own values instead of a float32 round
+    #trip through the matrix and its inverse
+    moved = np.flatnonzero((result != points).any(axis=1))
+    if len(moved):
+        rows = np.asarray(result[moved], dtype=np.float64)
+        out[moved] = rows if matrix is None else transform_points(rows, matrix)
+    return out
+
+
+def triangulate(faceCounts, faceConnects):
+    #fan triangulation of the polygons, returns (T,3) vertex ids
+    faceCounts = np.asarray(faceCounts, dtype=np.int64)
+    faceConnects = np.asarray(faceConnects, dtype=np.int64)
+    faceStarts = np.cumsum(faceCounts) - faceCounts
+    triCounts = np.maximum(faceCounts - 2, 0)
+    firsts = np.repeat(faceStarts, triCounts)
+    offsets = np.arange(triCounts.sum()) - np.repeat(np.cumsum(triCounts) - triCounts, triCounts)
+    return np.stack((faceConnects[firsts],
+                     faceConnects[firsts + offsets + 1],
+                     faceConnects[firsts + offsets + 2]), axis=1)
+
+
+def face_edges(faceCounts, faceConnects):
+    #unique undirected edges of the polygons, returns (E,2) vertex ids
+    faceCounts = np.asarray(faceCounts, dtype=np.int64)
+    faceConnects = np.asarray(faceConnects, dtype=np.int64)
+    faceStarts = np.cumsum(faceCounts) - faceCounts
+    nextIndex = np.arange(len(faceConnects)) + 1
+    nextIndex[faceStarts + faceCounts - 1] = faceStarts
+    edges = np.stack((faceConnects, faceConnects[nextIndex]), axis=1)
+    edges.sort(axis=1)
+    return np.unique(edges, axis=0)
+
+
+def normal_indices(faceCounts, faceConnects):
+    #the part of vertex_normals that only depends on the topology, callers
+    #that keep the topology can keep this with it
+    faceCounts = np.asarray(faceCounts, dtype=np.int64)
+    faceConnects = np.asarray(faceConnects, dtype=np.int64)
+    faceStarts = np.cumsum(faceCounts) - faceCounts
+    faceIds = np.repeat(np.arange(len(faceCounts)), faceCounts)
+    nextIndex = np.arange(len(faceConnects)) + 1
+    nextIndex[faceStarts + faceCounts - 1] = faceStarts
+    return faceConnects, faceConnects[nextIndex], faceIds, len(faceCounts)
+
+
+def vertex_normals(points, faceCounts, faceConnects, out=None, indices=None):
+    #average of the face normals, like MFnMesh.getVertexNormals(False)
+    faceConnects, nextConnects, faceIds, faceCount = (normal_indices(faceCounts, faceConnects)
+                                                      if indices is None else indices)
+    #newell's method
+    crosses = np.cross(points[faceConnects], points[nextConnects])
+    faceNormals = np.empty((faceCount, 3))
+    for axis in range(3):
+        faceNormals[:, axis] = np.bincount(faceIds, crosses[:, axis], faceCount)
+    faceNormals = _normalize(faceNormals)
+    vertexNormals = np.empty((len(points), 3)) if out is None else out
+    for axis in range(3):
+        vertexNormals[:, axis] = np.bincount(faceConnects, faceNormals[faceIds, axis], len(points))
+    length = np.sqrt(_dot(vertexNormals, vertexNormals))
+    length[length == 0] = 1.0
+    vertexNormals /= length[:, None]
+    return vertexNormals
+
+
+class MeshCollider(object):
+    #triangle collider backed by a BVH, the tree is kept while the topology is
+    def __init__(self, points, triangles, bboxMin=None, bboxMax=None):
+        self.triangles = np.asarray(triangles, dtype=np.int64)
+        self.bvh = BVH(self.triangles, points)
+        #edge k of a triangle runs from corner k to corner k+1
+        edges = np.stack((self.triangles, np.roll(self.triangles, -1, axis=1)), axis=-1).reshape(-1, 2)
+        edges.sort(axis=1)
+        edgeKeys, edgeIds = np.unique(edges, axis=0, return_inverse=True)
+        self.triEdges = edgeIds.reshape(-1, 3)
+        self.edgeCount = len(edgeKeys)
+        self._update_derived(bboxMin, bboxMax)
+
+    def update(self, points, bboxMin=None, bboxMax=None):
+        #same topology, new point positions. A collider shared by several
+        #deformers is only refit by the first one to see the new points
+        points = np.asarray(points, dtype=np.float64)
+        if points.shape == self.points.shape and np.array_equal(points, self.points):
+            if bboxMin is not None and bboxMax is not None:
+                self.bboxMin = np.asarray(bboxMin, dtype=np.float64)
+                self.bboxMax = np.asarray(bboxMax, dtype=np.float64)
+            return
+        self.bvh.refit(points)
+        self._update_derived(bboxMin, bboxMax)
+
+    def _update_derived(self, bboxMin, bboxMax):
+        self.points = self.bvh.points
+        a, b, c = self.bvh.corners
+        self.faceNormals = _normalize(np.cross(b - a, c - a))
+
+        #angle weighted pseudo normals of the vertices and edges
+        angles = corner_angles(a, b, c)
+        faceIds = np.repeat(np.arange(len(self.triangles)), 3)
+        self.vertexNormals = np.empty((len(self.points), 3))
+        self.edgeNormals = np.empty((self.edgeCount, 3))
+        for axis in range(3):
+            self.vertexNormals[:, axis] = np.bincount(self.triangles.ravel(),
+                                                      (angles * self.faceNormals[:, axis, None]).ravel(),
+                                                      len(self.points))
+            self.edgeNormals[:, axis] = np.bincount(self.triEdges.ravel(), self.faceNormals[faceIds, axis],
+                                                    self.edgeCount)
+
+        if bboxMin is None or bboxMax is None:
+            bboxMin = self.points.min(axis=0) if len(self.points) else np.zeros(3)
+            bboxMax = self.points.max(axis=0) if len(self.points) else np.zeros(3)
+        self.bboxMin = np.asarray(bboxMin, dtype=np.float64)
+        self.bboxMax = np.asarray(bboxMax, dtype=np.float64)
+
+    def bounds(self):
+        return self.bboxMin, self.bboxMax
+
+    def snapshot(self):
+        #flat copy of everything the queries depend on, used to detect motion
+        return np.concatenate((self.bboxMin, self.bboxMax, self.points.ravel()))
+
+    def closest_point(self, points):
+        #closest points and the triangle they are on
+        return self.bvh.closest_point(points)[:2]
+
+    def closest_normal(self, faces):
+        return self.faceNormals[faces]
+
+    def query(self, points):
+        #closest point, face normal and inside flag from a single traversal
+        closest, faces = self.closest_point(points)
+        return closest, self.faceNormals[faces], self.classify(points, closest, faces)
+
+    def classify(self, points, closest, faces):
+        #inside flags of points whose closest point on the given faces is known
+        tris = self.triangles[faces]
+        a, b, c = (self.points[tris[:, i]] for i in range(3))
+        weights = barycentric(closest, a, b, c)
+
+        #the feature the closest point lies on picks the pseudo normal
+        pseudoNormal = self.faceNormals[faces].copy()
+        onEdge = weights < FEATURE_TOLERANCE
+        rows = np.flatnonzero(onEdge.sum(axis=1) == 1)
+        opposite = onEdge[rows].argmax(axis=1)
+        pseudoNormal[rows] = self.edgeNormals[self.triEdges[faces[rows], (opposite + 1) % 3]]
+        rows = np.flatnonzero(onEdge.sum(axis=1) >= 2)
+        corner = weights[rows].argmax(axis=1)
+        pseudoNormal[rows] = self.vertexNormals[tris[rows, corner]]
+
+        return _dot(points - closest, pseudoNormal) < 0
+
+
+def bulge_ramp(positions):
+    #piecewise linear version of the default bulgeRamp
+    return np.interp(positions, BULGE_RAMP_POSITIONS, BULGE_RAMP_VALUES)
+
+
+def copy_points(points, out=None):
+    #points copied into out, or into a new array of the same precision
+    if out is None:
+        return np.array(points)
+    if out is not points:
+        out[:] = points
+    return out
+
+
+def active_vertices(weights):
+    #compacted ids of the vertices with a non zero weight
+    return np.flatnonzero(np.asarray(weights) != 0)
+
+
+def _join(parts):
+    #concatenates the (ids, values) results of the chunks of a pass
+    return np.concatenate([part[0] for part in parts]), np.concatenate([part[1] for part in parts])
+
+
+def in_box(points, ids, boxMin, boxMax):
+    #the ids whose points are inside the box, every axis only tests the ids the
+    #axis before kept
+    for axis in range(3):
+        values = points[ids, axis]
+        ids = ids[(values >= boxMin[axis]) & (values <= boxMax[axis])]
+    return ids
+
+
+def contact_pass(collider, points, ids, workers=1):
+    #the vertices of ids inside the collider and their offset from its surface
+    def chunk_pass(chunk):
+        closePoint, closeNormal, inside = collider.query(points[chunk])
+        return chunk[inside], points[chunk[inside]] - closePoint[inside]
+    return _join(map_chunks(chunk_pass, ids, workers))
+
+
+def band_pass(collider, points, ids, bulgeDistance, workers=1):
+    #the vertices of ids within bulgeDistance of the collider and their distance
+    def chunk_pass(chunk):
+        closePoint = collider.closest_point(points[chunk])[0]
+        distance = np.sqrt(_dot(points[chunk] - closePoint, points[chunk] - closePoint))
+        near = distance < bulgeDistance
+        return chunk[near], distance[near]
+    return _join(map_chunks(chunk_pass, ids, workers))
+
+
+def empty_pass(width=3):
+    return np.zeros(0, dtype=np.int64), np.zeros((0, width) if width else 0)
+
+
+def contact_depths(contacts):
+    #deepest penetration of every collider
+    return np.array([np.sqrt(_dot(delta, delta)).max() if len(ids) else 0.0 for ids, delta in contacts])
+
+
+def resolve(points, normals, weights, contacts, bands, envelope=1.0,
+            bulgeDistance=0.0, bulgeStrength=1.0, bulgeRamp=bulge_ramp,
+            smoothIterations=0, adjacency=None, workers=1, timer=None, out=None):
+    #combines the per collider contact and band passes into the final points
+    result = copy_points(points, out)
+    colliding = np.zeros(len(points), dtype=bool)
+    maxDistances = contact_depths(contacts)
+
+    #direct deformation
+    touching = [pair for pair in contacts if len(pair[0])]
+    if touching:
+        with stage(timer, "pushout"):
+            #a vertex inside several colliders leaves the deepest one
+            ids = np.concatenate([pair[0] for pair in touching])
+            delta = np.concatenate([pair[1] for pair in touching])
+            deepest = _first_per_group(ids, -_dot(delta, delta))
+            ids = ids[deepest]
+            result[ids] -= delta[deepest] * (weights[ids] * envelope)[:, None]
+            colliding[ids] = True
+            count(timer, "inside", len(ids))
+
+    #indirect deformation
+    if maxDistances.any() and bulgeDistance != 0 and bulgeStrength != 0:
+        with stage(timer, "bulge"):
+            bulgeIds = []
+            bulgeAmounts = []
+            for col, (ids, distance) in enumerate(bands):
+                if maxDistances[col] == 0:
+                    continue
+                free = ~colliding[ids]
+                if not free.any():
+                    continue
+                normalizedDistance = distance[free] / bulgeDistance
+                reversedNormalize = 1.0 - normalizedDistance
+                bulgeResult = np.asarray(bulgeRamp(normalizedDistance), dtype=np.float64)
+                bulgeIds.append(ids[free])
+                bulgeAmounts.append(maxDistances[col] * reversedNormalize * bulgeResult)
+            if bulgeIds:
+                #the collider giving the largest bulge wins
+                ids = np.concatenate(bulgeIds)
+                amount = np.concatenate(bulgeAmounts)
+                largest = _first_per_group(ids, -amount)
+                ids = ids[largest]
+                scale = amount[largest] * bulgeStrength * weights[ids] * envelope
+                result[ids] += normals[ids] * scale[:, None]
+                colliding[ids] = True
+                count(timer, "bulged", len(ids))
+
+    #post deformation smoothing
+    if smoothIterations and adjacency is not None and colliding.any():
+        with stage(timer, "smoothing"):
+            result = adjacency.smooth(result, colliding, smoothIterations, envelope, workers, result, points)
+            count(timer, "smoothed", colliding.sum())
+
+    return result
+
+
+def cull_counts(timer, tested, pairIds, pairColliders, colliderCount):
+    timer.count("tested", tested)
+    timer.count("culled", tested - len(np.unique(pairIds)))
+    timer.count("skippedColliders", colliderCount - len(np.unique(pairColliders)))
+
+
+def deform(points, normals, weights, colliders, envelope=1.0,
+           bulgeDistance=0.0, bulgeStrength=1.0, bulgeRamp=bulge_ramp,
+           smoothIterations=0, adjacency=None, active=None, workers=1, timer=None, out=None):
+    #workers splits the vertex queries over a thread pool, 0 uses every core,
+    #a timing.StageTimer passed as timer collects the time of every stage and
+    #the result is written into out when it is given
+    points = float_array(points)
+    normals = float_array(normals)
+    weights = float_array(weights)
+    colliders = list(colliders)
+    if envelope == 0 or not colliders:
+        return copy_points(points, out)
+
+    #every collider is handled in the same pass, the box tree routes the
+    #vertices only to the colliders whose bounding box they are in
+    active = active_vertices(weights) if active is None else np.asarray(active, dtype=np.int64)
+    with stage(timer, "culling"):
+        tree = BoxTree.from_colliders(colliders)
+        pairIds, pairColliders = tree.overlaps(points[active])
+    if timer is not None:
+        cull_counts(timer, len(active), pairIds, pairColliders, len(colliders))
+
+    #direct deformation
+    contacts = [empty_pass() for collider in colliders]
+    with stage(timer, "inside"):
+        for col in np.unique(pairColliders):
+            contacts[col] = contact_pass(colliders[col], points, active[pairIds[pairColliders == col]], workers)
+
+    #indirect deformation
+    bands = [empty_pass(0) for collider in colliders]
+    pressing = np.flatnonzero(contact_depths(contacts) > 0)
+    if len(pressing) and bulgeDistance != 0 and bulgeStrength != 0:
+        with stage(timer, "bulge"):
+            #only the vertices within the band around a collider's box are queried
+            colliding = np.zeros(len(points), dtype=bool)
+            for ids, delta in contacts:
+                colliding[ids] = True
+            candidates = active[~colliding[active]]
+            for col in pressing:
+                colMin, colMax = colliders[col].bounds()
+                ids = in_box(points, candidates, colMin - bulgeDistance, colMax + bulgeDistance)
+                if len(ids):
+                    bands[col] = band_pass(colliders[col], points, ids, bulgeDistance, workers)
+
+    return resolve(points, normals, weights, contacts, bands, envelope,
+                   bulgeDistance, bulgeStrength, bulgeRamp, smoothIterations, adjacency, workers, timer, out)
@@ -0,0 +1,121 @@
+import numpy as np
+
+#triangle level math shared by the kernel and the acceleration structures
+
+RAY_TOLERANCE = 0.0001
+
+
+def float_array(values):
+    #float32 and float64 arrays are used as they are, anything else becomes float64
+    values = np.asarray(values)
+    return values if values.dtype in (np.float32, np.float64) else values.astype(np.float64)
+
+
+def _dot(a, b):
+    return np.einsum("...i,...i->...", a, b)
+
+
+def _normalize(vectors):
+    length = np.sqrt(_dot(vectors, vectors))
+    length[length == 0] = 1.0
+    return vectors / length[..., None]
+
+
+def _first_per_group(groups, values):
+    #index of the smallest value of every group in a batch of pairs
+    order = np.lexsort((values, groups))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = groups[order][1:] != groups[order][:-1]
+    return order[first]
+
+
+def closest_point_on_triangles(points, a, b, c):
+    #ericson's region test, every argument broadcasts against the others
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+    d1 = _dot(ab, ap)
+    d2 = _dot(ac, ap)
+    d3 = _dot(ab, bp)
+    d4 = _dot(ac, bp)
+    d5 = _dot(ab, cp)
+    d6 = _dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = va + vb + vc
+        v = np.where(denom != 0, vb / denom, 0.0)
+        w = np.where(denom != 0, vc / denom, 0.0)
+        result = a + ab * v[..., None] + ac * w[..., None]
+
+        #checks are applied from the lowest priority to the highest
+        edge = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        t = np.where(edge, (d4 - d3) / ((d4 - d3) + (d5 - d6)), 0.0)
+        result = np.where(edge[..., None], b + (c - b) * t[..., None], result)
+
+        edge = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        t = np.where(edge, d2 / (d2 - d6), 0.0)
+        result = np.where(edge[..., None], a + ac * t[..., None], result)
+
+        corner = (d6 >= 0) & (d5 <= d6)
+        result = np.where(corner[..., None], c, result)
+
+        edge = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        t = np.where(edge, d1 / (d1 - d3), 0.0)
+        result = np.where(edge[..., None], a + ab * t[..., None], result)
+
+        corner = (d3 >= 0) & (d4 <= d3)
+        result = np.where(corner[..., None], b, result)
+
+        corner = (d1 <= 0) & (d2 <= 0)
+        result = np.where(corner[..., None], a, result)
+
+    return np.nan_to_num(result)
+
+
+def ray_triangle_params(origins, directions, a, b, c, tolerance=RAY_TOLERANCE):
+    #moller-trumbore, returns the ray parameter or inf where there is no hit
+    e1 = b - a
+    e2 = c - a
+    pvec = np.cross(directions, e2)
+    det = _dot(e1, pvec)
+    valid = np.abs(det) > 1e-12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        invDet = np.where(valid, 1.0 / det, 0.0)
+        tvec = origins - a
+        u = _dot(tvec, pvec) * invDet
+        qvec = np.cross(tvec, e1)
+        v = _dot(directions, qvec) * invDet
+        t = _dot(e2, qvec) * invDet
+    hit = valid & (u >= -tolerance) & (v >= -tolerance) & (u + v <= 1.0 + tolerance) & (t >= 0)
+    return np.where(hit, t, np.inf)
+
+
+def barycentric(points, a, b, c):
+    #weights of a, b and c for points lying on the triangles
+    v0 = b - a
+    v1 = c - a
+    v2 = points - a
+    d00 = _dot(v0, v0)
+    d01 = _dot(v0, v1)
+    d11 = _dot(v1, v1)
+    d20 = _dot(v2, v0)
+    d21 = _dot(v2, v1)
+    denom = d00 * d11 - d01 * d01
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = np.where(denom != 0, (d11 * d20 - d01 * d21) / denom, 0.0)
+        w = np.where(denom != 0, (d00 * d21 - d01 * d20) / denom, 0.0)
+    return np.stack((1.0 - v - w, v, w), axis=-1)
+
+
+def corner_angles(a, b, c):
+    #interior angle at every corner of the triangles, (T,3)
+    angles = []
+    for origin, first, second in ((a, b, c), (b, c, a), (c, a, b)):
+        cosine = _dot(_normalize(first - origin), _normalize(second - origin))
+        angles.append(np.arccos(np.clip(cosine, -1.0, 1.0)))
+    return np.stack(angles, axis=-1)
@@ -0,0 +1,134 @@
+import numpy as np
+
+from ny_collision.broadphase import BoxTree
+from ny_collision.core import (active_vertices, band_pass, bulge_ramp, contact_depths, contact_pass, copy_points,
+                               cull_counts, empty_pass, in_box, resolve)
+from ny_collision.geometry import float_array
+from ny_collision.timing import stage
+
+#Temporal coherence. The per collider contact and band passes of the previous
+#evaluation are kept and only the parts touched by a moved collider or a moved
+#vertex are queried again, the result is the same as a full evaluation.
+
+#fraction of the active vertices that may move before a full evaluation is done
+MOVED_THRESHOLD = 0.25
+
+
+def _replace(pair, ids, fresh):
+    #drops the entries of ids from the pass and appends the fresh ones
+    keep = ~np.isin(pair[0], ids)
+    return np.concatenate((pair[0][keep], fresh[0])), np.concatenate((pair[1][keep], fresh[1]))
+
+
+class IncrementalDeformer(object):
+    def __init__(self, threshold=MOVED_THRESHOLD):
+        self.threshold = threshold
+        self.workers = 1
+        self.timer = None
+        self.fullEvaluations = 0
+        self.incrementalEvaluations = 0
+        self.reset()
+
+    def reset(self):
+        self.points = None
+        self.active = None
+        self.bulgeDistance = None
+        self.snapshots = []
+        self.contacts = []
+        self.bands = []
+
+    def _moved(self, points, active, bulgeDistance, snapshots):
+        #vertices that moved since the last evaluation, None when everything has to be redone
+        if self.points is None or self.points.shape != points.shape:
+            return None
+        if bulgeDistance != self.bulgeDistance or len(snapshots) != len(self.snapshots):
+            return None
+        if not np.array_equal(active, self.active):
+            return None
+        moved = active[(points[active] != self.points[active]).any(axis=1)]
+        if len(moved) > self.threshold * len(active):
+            return None
+        return moved
+
+    def _refresh_bands(self, points, colliders, active, bulgeDistance):
+        #bands are only kept for the colliders that are pressing
+        depths = contact_depths(self.contacts)
+        for col, collider in enumerate(colliders):
+            if depths[col] == 0 or bulgeDistance == 0:
+                self.bands[col] = None
+            elif self.bands[col] is None:
+                with stage(self.timer, "bulge"):
+                    colMin, colMax = collider.bounds()
+                    ids = in_box(points, active, colMin - bulgeDistance, colMax + bulgeDistance)
+                    self.bands[col] = (band_pass(collider, points, ids, bulgeDistance, self.workers)
+                                       if len(ids) else empty_pass(0))
+
+    def _full(self, points, colliders, active):
+        with stage(self.timer, "culling"):
+            tree = BoxTree.from_colliders(colliders)
+            pairIds, pairColliders = tree.overlaps(points[active])
+        if self.timer is not None:
+            cull_counts(self.timer, len(active), pairIds, pairColliders, len(colliders))
+        self.contacts = [empty_pass() for collider in colliders]
+        self.bands = [None for collider in colliders]
+        with stage(self.timer, "inside"):
+            for col in np.unique(pairColliders):
+                self.contacts[col] = contact_pass(colliders[col], points, active[pairIds[pairColliders == col]],
+                                                  self.workers)
+        self.fullEvaluations += 1
+
+    def _update(self, points, colliders, active, snapshots, moved, bulgeDistance):
+        #moved vertices and colliders are queried again
+        with stage(self.timer, "inside"):
+            if self.timer is not None:
+                #a moved collider tests every active vertex against its box
+                unchanged = all(np.array_equal(new, old) for new, old in zip(snapshots, self.snapshots))
+                self.timer.count("tested", len(moved) if unchanged else len(active))
+            for col, collider in enumerate(colliders):
+                colMin, colMax = collider.bounds()
+                if not np.array_equal(snapshots[col], self.snapshots[col]):
+                    #everything the collider touched before was inside its old bounds,
+                    #so its passes are replaced wholesale by a query of its new bounds
+                    ids = in_box(points, active, colMin, colMax)
+                    self.contacts[col] = contact_pass(collider, points, ids, self.workers) if len(ids) else empty_pass()
+                    self.bands[col] = None
+                elif len(moved):
+                    ids = in_box(points, moved, colMin, colMax)
+                    fresh = contact_pass(collider, points, ids, self.workers) if len(ids) else empty_pass()
+                    self.contacts[col] = _replace(self.contacts[col], moved, fresh)
+                    if self.bands[col] is not None:
+                        ids = in_box(points, moved, colMin - bulgeDistance, colMax + bulgeDistance)
+                        fresh = band_pass(collider, points, ids, bulgeDistance, self.workers) if len(ids) else empty_pass(0)
+                        self.bands[col] = _replace(self.bands[col], moved, fresh)
+        self.incrementalEvaluations += 1
+
+    def deform(self, points, normals, weights, colliders, envelope=1.0,
+               bulgeDistance=0.0, bulgeStrength=1.0, bulgeRamp=bulge_ramp,
+               smoothIterations=0, adjacency=None, active=None, workers=1, timer=None, out=None):
+        #same arguments and result as core.deform
+        self.workers = workers
+        self.timer = timer
+        points = float_array(points)
+        normals = float_array(normals)
+        weights = float_array(weights)
+        colliders = list(colliders)
+        if envelope == 0 or not colliders:
+            return copy_points(points, out)
+
+        active = active_vertices(weights) if active is None else np.asarray(active, dtype=np.int64)
+        snapshots = [collider.snapshot() for collider in colliders]
+        moved = self._moved(points, active, bulgeDistance, snapshots)
+        if moved is None:
+            self._full(points, colliders, active)
+        else:
+            self._update(points, colliders, active, snapshots, moved, bulgeDistance)
+        self._refresh_bands(points, colliders, active, bulgeDistance)
+
+        self.points = points.copy()
+        self.active = active.copy()
+        self.bulgeDistance = bulgeDistance
+        self.snapshots = snapshots
+
+        bands = [band if band is not None else empty_pass(0) for band in self.bands]
+        return resolve(points, normals, weights, self.contacts, bands, envelope,
+                       bulgeDistance, bulgeStrength, bulgeRamp, smoothIterations, adjacency, workers, timer, out)
@@ -0,0 +1,54 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+#Chunked evaluation on a shared thread pool. numpy releases the GIL inside its
+#array kernels, so the chunks of a large query run on several cores at once.
+#Chunk results are always put back together in order, so the result doesn't
+#depend on the worker count.
+
+#smallest chunk worth handing to a worker
+MIN_CHUNK = 4096
+
+#chunks per worker, a few more than one evens out chunks of uneven cost
+CHUNKS_PER_WORKER = 4
+
+_pools = {}
+_poolLock = threading.Lock()
+
+
+def worker_count(workers=0):
+    #0 or less means one worker per core
+    return int(workers) if workers > 0 else (os.cpu_count() or 1)
+
+
+def chunk_size(count, workers):
+    #grows with the mesh so every worker gets a few chunks
+    return max(MIN_CHUNK, -(-count // (worker_count(workers) * CHUNKS_PER_WORKER)))
+
+
+def split(ids, workers):
+    size = chunk_size(len(ids), workers)
+    return [ids[start:start + size] for start in range(0, len(ids), size)] or [ids]
+
+
+def _pool(workers):
+    with _poolLock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(workers)
+            _pools[workers] = pool
+        return pool
+
+
+def run(function, items, workers=1):
+    #function applied to every item, results in item order
+    workers = worker_count(workers)
+    if workers == 1 or len(items) < 2:
+        return [function(item) for item in items]
+    return list(_pool(workers).map(function, items))
+
+
+def map_chunks(function, ids, workers=1):
+    #function applied to consecutive chunks of ids, results in chunk order
+    return run(function, split(ids, workers), workers)
@@ -0,0 +1,186 @@
+import bisect
+import zlib
+
+import numpy as np
+
+from ny_collision.core import copy_points
+from ny_collision.geometry import _dot
+
+#Plastic deformation. Every vertex keeps the largest displacement it has had
+#since the start frame, so dents stay after the collider leaves. The state of
+#a frame is built from the state of the frame before, it is held as float32
+#offsets of the displaced vertices only. Checkpoints taken every few frames let
+#a jump on the timeline replay from the nearest one instead of the start frame.
+
+ELASTICITY_MODES = ("elastic", "plastic")
+
+CHECKPOINT_INTERVAL = 10
+CHECKPOINT_MEMORY = 64 * 1024 * 1024
+
+
+class OffsetBuffer(object):
+    #float32 offsets of the displaced vertices, every other vertex is at rest
+    def __init__(self, count, ids=None, offsets=None):
+        self.count = count
+        self.ids = np.zeros(0, dtype=np.int32) if ids is None else np.asarray(ids, dtype=np.int32)
+        self.offsets = (np.zeros((0, 3), dtype=np.float32) if offsets is None
+                        else np.asarray(offsets, dtype=np.float32).reshape(-1, 3))
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.offsets.nbytes
+
+    def apply(self, points, out=None):
+        result = copy_points(points, out)
+        result[self.ids] += self.offsets
+        return result
+
+    def pack(self, compress=False):
+        data = self.ids.tobytes() + self.offsets.tobytes()
+        return self.count, len(self.ids), compress, zlib.compress(data, 1) if compress else data
+
+    @classmethod
+    def unpack(cls, packed):
+        count, idCount, compress, data = packed
+        data = zlib.decompress(data) if compress else data
+        ids = np.frombuffer(data, dtype=np.int32, count=idCount)
+        offsets = np.frombuffer(data, dtype=np.float32, offset=idCount * 4)
+        return cls(count, ids, offsets)
+
+
+def plastic_step(previous, points, result):
+    #every vertex keeps the larger of its stored offset and this frame's displacement
+    displacement = np.asarray(result, dtype=np.float64) - points
+    ids = np.union1d(np.flatnonzero((displacement != 0).any(axis=1)), previous.ids)
+    current = displacement[ids]
+    stored = np.zeros((len(ids), 3))
+    stored[np.searchsorted(ids, previous.ids)] = previous.offsets
+    offsets = np.where((_dot(stored, stored) >= _dot(current, current))[:, None], stored, current)
+    displaced = (offsets != 0).any(axis=1)
+    return OffsetBuffer(len(points), ids[displaced], offsets[displaced])
+
+
+class Checkpoints(object):
+    def __init__(self, interval=CHECKPOINT_INTERVAL, maxBytes=CHECKPOINT_MEMORY, compress=False):
+        self.interval = interval
+        self.maxBytes = maxBytes
+        self.compress = compress
+        self.clear()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def clear(self):
+        self.frames = []
+        self.entries = {}
+        self.nbytes = 0
+
+    def due(self, frame, startFrame):
+        return (frame - startFrame) % self.interval == 0
+
+    def store(self, frame, buffer):
+        self.discard(frame)
+        packed = buffer.pack(self.compress)
+        bisect.insort(self.frames, frame)
+        self.entries[frame] = packed
+        self.nbytes += len(packed[3])
+        self._evict(frame)
+
+    def discard(self, frame):
+        packed = self.entries.pop(frame, None)
+        if packed is not None:
+            self.frames.remove(frame)
+            self.nbytes -= len(packed[3])
+
+    def nearest(self, frame):
+        #(frame, buffer) of the last checkpoint at or before frame, None if there is none
+        index = bisect.bisect_right(self.frames, frame)
+        if index == 0:
+            return None
+        found = self.frames[index - 1]
+        return found, OffsetBuffer.unpack(self.entries[found])
+
+    def _gap(self, index):
+        #frames between the neighbours of a checkpoint, the first one goes last
+        if index == 0:
+            return float("inf")
+        return self.frames[min(index + 1, len(self.frames) - 1)] - self.frames[index - 1]
+
+    def _evict(self, keep=None):
+        #thins the checkpoints out where they are closest together so the rest
+        #stay spread over the timeline, keep is never dropped
+        while self.nbytes > self.maxBytes and len(self.frames) > 1:
+            candidates = [index for index, frame in enumerate(self.frames) if frame != keep]
+            self.discard(self.frames[min(candidates, key=self._gap)])
+
+
+class PlasticDeformer(object):
+    def __init__(self, startFrame=1.0, interval=CHECKPOINT_INTERVAL, maxBytes=CHECKPOINT_MEMORY, compress=False):
+        self.startFrame = startFrame
+        self.key = None
+        self.checkpoints = Checkpoints(interval, maxBytes, compress)
+        self.replayedFrames = 0
+        self.reset()
+
+    def reset(self):
+        self.frame = None
+        self.base = None
+        self.state = None
+        self.checkpoints.clear()
+
+    def configure(self, key, startFrame=1.0, interval=CHECKPOINT_INTERVAL, maxBytes=CHECKPOINT_MEMORY,
+                  compress=False):
+        #the history is only valid for the settings it was made with, key is
+        #anything comparable that describes them
+        if key != self.key or startFrame != self.startFrame or interval != self.checkpoints.interval:
+            self.key = key
+            self.startFrame = startFrame
+            self.checkpoints.interval = interval
+            self.reset()
+        self.checkpoints.compress = compress
+        if maxBytes != self.checkpoints.maxBytes:
+            self.checkpoints.maxBytes = maxBytes
+            self.checkpoints._evict(self.frame)
+
+    def _checkpoint(self, frame, state):
+        if self.checkpoints.due(frame, self.startFrame):
+            self.checkpoints.store(frame, state)
+
+    def _state_before(self, frame, count, replay):
+        #state after the frame before, replayed from the nearest known state
+        previous = frame - 1
+        if previous < self.startFrame:
+            return OffsetBuffer(count)
+        if self.frame == previous:
+            return self.state
+        if self.frame == frame:
+            return self.base
+        found = self.checkpoints.nearest(previous)
+        stateFrame, state = found if found is not None else (self.startFrame - 1, OffsetBuffer(count))
+        if self.frame is not None and stateFrame < self.frame <= previous:
+            stateFrame, state = self.frame, self.state
+        if state.count != count:
+            self.reset()
+            stateFrame, state = self.startFrame - 1, OffsetBuffer(count)
+        #without a replay the state of the nearest frame is used as it is
+        while replay is not None and stateFrame + 1 <= previous:
+            elastic = replay(stateFrame + 1)
+            if elastic is None:
+                break
+            stateFrame += 1
+            state = plastic_step(state, *elastic)
+            self._checkpoint(stateFrame, state)
+            self.replayedFrames += 1
+        return state
+
+    def deform(self, frame, points, result, replay=None, out=None):
+        #points are the undeformed points and result their elastic deformation,
+        #replay(frame) gives the same pair for an earlier frame or None. out may
+        #be the result itself
+        base = self._state_before(frame, len(points), replay)
+        state = plastic_step(base, points, result)
+        self.frame = frame
+        self.base = base
+        self.state = state
+        self._checkpoint(frame, state)
+        return state.apply(points, out)
@@ -0,0 +1,177 @@
+import numpy as np
+
+from ny_collision.geometry import _dot
+
+#Analytic colliders described by a matrix and a few parameters. The queries are
+#closed form over all the points at once, no acceleration structure is needed.
+#The matrix scale is folded into the parameters, shear is ignored.
+
+PRIMITIVE_TYPES = ("sphere", "capsule", "box", "plane")
+
+#direction used where the closest point is ambiguous, like the centre of a sphere
+FALLBACK_AXIS = np.array([0.0, 1.0, 0.0])
+
+
+def _unit(vectors, length):
+    #vectors divided by their lengths, the fallback axis where the length is zero
+    safe = length > 1e-12
+    result = np.tile(FALLBACK_AXIS, (len(vectors), 1))
+    result[safe] = vectors[safe] / length[safe, None]
+    return result
+
+
+class PrimitiveCollider(object):
+    #every type gives its closest point, normal and inside flag in local space from _local_query
+    def __init__(self, matrix):
+        self.set_matrix(matrix)
+
+    def set_matrix(self, matrix):
+        #splits the matrix into a rotation, a translation and the scale of every axis
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(4, 4)
+        self.scale = np.sqrt(_dot(self.matrix[:3, :3], self.matrix[:3, :3]))
+        self.rotation = self.matrix[:3, :3] / np.maximum(self.scale, 1e-12)[:, None]
+        self.translation = self.matrix[3, :3].copy()
+
+    def parameters(self):
+        return np.zeros(0)
+
+    def snapshot(self):
+        return np.concatenate((self.matrix.ravel(), self.parameters()))
+
+    def to_local(self, points):
+        return np.dot(np.asarray(points, dtype=np.float64) - self.translation, self.rotation.T)
+
+    def to_world(self, points):
+        return np.dot(points, self.rotation) + self.translation
+
+    def query(self, points):
+        #closest point, surface normal and inside flag
+        closest, normal, inside = self._local_query(self.to_local(points))
+        return self.to_world(closest), np.dot(normal, self.rotation), inside
+
+    def closest_point(self, points):
+        closest = self.query(points)[0]
+        return closest, np.full(len(closest), -1, dtype=np.int64)
+
+
+class SphereCollider(PrimitiveCollider):
+    def __init__(self, matrix, radius=1.0):
+        self.baseRadius = float(radius)
+        PrimitiveCollider.__init__(self, matrix)
+
+    def set_matrix(self, matrix):
+        PrimitiveCollider.set_matrix(self, matrix)
+        self.radius = self.baseRadius * self.scale.max()
+
+    def parameters(self):
+        return np.array([self.baseRadius])
+
+    def bounds(self):
+        return self.translation - self.radius, self.translation + self.radius
+
+    def _local_query(self, local):
+        length = np.sqrt(_dot(local, local))
+        normal = _unit(local, length)
+        return normal * self.radius, normal, length < self.radius
+
+
+class CapsuleCollider(PrimitiveCollider):
+    #sphere swept along the local y axis, height is the length of the straight part
+    def __init__(self, matrix, radius=1.0, height=2.0):
+        self.baseRadius = float(radius)
+        self.baseHeight = float(height)
+        PrimitiveCollider.__init__(self, matrix)
+
+    def set_matrix(self, matrix):
+        PrimitiveCollider.set_matrix(self, matrix)
+        self.radius = self.baseRadius * max(self.scale[0], self.scale[2])
+        self.halfHeight = self.baseHeight * self.scale[1] * 0.5
+
+    def parameters(self):
+        return np.array([self.baseRadius, self.baseHeight])
+
+    def bounds(self):
+        ends = self.to_world(np.array([[0.0, -self.halfHeight, 0.0], [0.0, self.halfHeight, 0.0]]))
+        return ends.min(axis=0) - self.radius, ends.max(axis=0) + self.radius
+
+    def _local_query(self, local):
+        axis = np.zeros_like(local)
+        axis[:, 1] = np.clip(local[:, 1], -self.halfHeight, self.halfHeight)
+        offset = local - axis
+        length = np.sqrt(_dot(offset, offset))
+        normal = _unit(offset, length)
+        return axis + normal * self.radius, normal, length < self.radius
+
+
+class BoxCollider(PrimitiveCollider):
+    #box centred on the matrix, size is the length of every side
+    def __init__(self, matrix, size=(1.0, 1.0, 1.0)):
+        self.baseSize = np.asarray(size, dtype=np.float64).reshape(3)
+        PrimitiveCollider.__init__(self, matrix)
+
+    def set_matrix(self, matrix):
+        PrimitiveCollider.set_matrix(self, matrix)
+        self.extent = np.abs(self.baseSize * self.scale) * 0.5
+
+    def parameters(self):
+        return self.baseSize
+
+    def bounds(self):
+        reach = np.dot(self.extent, np.abs(self.rotation))
+        return self.translation - reach, self.translation + reach
+
+    def _local_query(self, local):
+        closest = np.clip(local, -self.extent, self.extent)
+        offset = local - closest
+        length = np.sqrt(_dot(offset, offset))
+        normal = _unit(offset, length)
+        inside = (np.abs(local) < self.extent).all(axis=1)
+
+        #points inside leave through the nearest side
+        ids = np.flatnonzero(inside)
+        if len(ids):
+            room = self.extent - np.abs(local[ids])
+            axis = room.argmin(axis=1)
+            side = np.where(local[ids, axis] < 0, -1.0, 1.0)
+            closest[ids, axis] = side * self.extent[axis]
+            normal[ids] = 0.0
+            normal[ids, axis] = side
+        return closest, normal, inside
+
+
+class PlaneCollider(PrimitiveCollider):
+    #infinite plane through the matrix position facing the local y axis,
+    #everything below it is inside
+    def bounds(self):
+        boundMin = np.full(3, -np.inf)
+        boundMax = np.full(3, np.inf)
+        normal = self.rotation[1]
+        axis = int(np.abs(normal).argmax())
+        if abs(normal[axis]) > 1.0 - 1e-9:
+            #only an axis aligned plane bounds its half space
+            if normal[axis] > 0:
+                boundMax[axis] = self.translation[axis]
+            else:
+                boundMin[axis] = self.translation[axis]
+        return boundMin, boundMax
+
+    def _local_query(self, local):
+        closest = local.copy()
+        closest[:, 1] = 0.0
+        normal = np.tile(FALLBACK_AXIS, (len(local), 1))
+        return closest, normal, local[:, 1] < 0
+
+
+def primitive_collider(kind, matrix, radius=1.0, height=2.0, size=(1.0, 1.0, 1.0)):
+    #collider of a PRIMITIVE_TYPES index or name
+    if not isinstance(kind, str):
+        kind = PRIMITIVE_TYPES[kind]
+    if kind == "sphere":
+        return SphereCollider(matrix, radius)
+    if kind == "capsule":
+        return CapsuleCollider(matrix, radius, height)
+    if kind == "box":
+        return BoxCollider(matrix, size)
+    if kind == "plane":
+        return PlaneCollider(matrix)
+    raise ValueError("unknown primitive type: {}".format(kind))
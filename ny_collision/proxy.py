@@ -0,0 +1,117 @@
+import numpy as np
+
+from ny_collision.core import MeshCollider
+from ny_collision.geometry import _dot
+
+#Decimated query proxies for dense colliders. The vertices are clustered on a
+#grid whose cells are maxError across, every cluster collapses to the mean of
+#its vertices, so no vertex moves further than maxError. The clustering only
+#depends on the topology and is kept while the collider deforms, it is made
+#again once a vertex drifts further than maxError from its cluster.
+
+
+def cluster_vertices(points, maxError):
+    #cluster id of every vertex and the cluster count
+    cell = maxError / np.sqrt(3.0)
+    keys = np.floor((points - points.min(axis=0)) / cell).astype(np.int64)
+    clusters, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return inverse.ravel(), len(clusters)
+
+
+def cluster_points(points, clusters, clusterCount):
+    #mean position of every cluster
+    counts = np.bincount(clusters, minlength=clusterCount)
+    proxyPoints = np.empty((clusterCount, 3))
+    for axis in range(3):
+        proxyPoints[:, axis] = np.bincount(clusters, points[:, axis], clusterCount) / counts
+    return proxyPoints
+
+
+def cluster_triangles(triangles, clusters):
+    #triangles between clusters. Collapsed triangles are dropped, so are pairs
+    #facing each other across a sheet that collapsed flat
+    proxyTriangles = clusters[triangles]
+    a, b, c = proxyTriangles.T
+    proxyTriangles = proxyTriangles[(a != b) & (b != c) & (c != a)]
+    #the first corner is rotated to the smallest id, a facing pair is then the same
+    #triangle with its last two corners swapped
+    first = proxyTriangles.argmin(axis=1)
+    proxyTriangles = proxyTriangles[np.arange(len(proxyTriangles))[:, None], (first[:, None] + np.arange(3)) % 3]
+    flipped = proxyTriangles[:, 1] > proxyTriangles[:, 2]
+    keys, firstIds, inverse = np.unique(np.sort(proxyTriangles, axis=1), axis=0, return_index=True,
+                                        return_inverse=True)
+    inverse = inverse.ravel()
+    flips = np.bincount(inverse, flipped, len(keys))
+    facing = (flips > 0) & (flips < np.bincount(inverse, minlength=len(keys)))
+    return proxyTriangles[firstIds[~facing]]
+
+
+class ProxyCollider(object):
+    #queries a decimated proxy, with exact on the push-out asks the full mesh where it matters
+    def __init__(self, points, triangles, maxError, exact=False, bboxMin=None, bboxMax=None):
+        self.triangles = np.asarray(triangles, dtype=np.int64)
+        self.maxError = float(maxError)
+        self.exact = None
+        self.proxy = None
+        self.clusters = None
+        self.rebuilds = 0
+        self.update(points, bboxMin, bboxMax)
+        self.set_exact(exact)
+
+    def set_exact(self, exact):
+        #the full mesh is only kept while the push-out asks for it
+        if not exact:
+            self.exact = None
+        elif self.exact is None:
+            self.exact = MeshCollider(self.points, self.triangles)
+
+    def _build(self, points):
+        self.clusters, clusterCount = cluster_vertices(points, self.maxError)
+        proxyTriangles = cluster_triangles(self.triangles, self.clusters)
+        if not len(proxyTriangles):
+            #nothing is left at this error, the proxy is the mesh itself
+            self.clusters, clusterCount, proxyTriangles = np.arange(len(points)), len(points), self.triangles
+        self.proxy = MeshCollider(cluster_points(points, self.clusters, clusterCount), proxyTriangles)
+        self.rebuilds += 1
+
+    def update(self, points, bboxMin=None, bboxMax=None):
+        self.points = points = np.asarray(points, dtype=np.float64)
+        if self.exact is not None:
+            self.exact.update(points)
+        if self.proxy is None or len(points) != len(self.clusters):
+            self._build(points)
+        else:
+            proxyPoints = cluster_points(points, self.clusters, len(self.proxy.points))
+            drift = points - proxyPoints[self.clusters]
+            if len(points) and _dot(drift, drift).max() > self.maxError * self.maxError:
+                self._build(points)
+            else:
+                self.proxy.update(proxyPoints)
+
+        if bboxMin is None or bboxMax is None:
+            bboxMin = points.min(axis=0) if len(points) else np.zeros(3)
+            bboxMax = points.max(axis=0) if len(points) else np.zeros(3)
+        self.bboxMin = np.asarray(bboxMin, dtype=np.float64)
+        self.bboxMax = np.asarray(bboxMax, dtype=np.float64)
+
+    def bounds(self):
+        return self.bboxMin, self.bboxMax
+
+    def snapshot(self):
+        mesh = self.proxy if self.exact is None else self.exact
+        return np.concatenate((self.bboxMin, self.bboxMax, mesh.points.ravel()))
+
+    def closest_point(self, points):
+        return self.proxy.closest_point(points)
+
+    def query(self, points):
+        #closest point, face normal and inside flag. With exact on, the points the
+        #proxy finds inside or within twice the error ask the full mesh again
+        closest, normal, inside = self.proxy.query(points)
+        if self.exact is None:
+            return closest, normal, inside
+        offset = points - closest
+        near = np.flatnonzero(inside | (_dot(offset, offset) <= 4 * self.maxError * self.maxError))
+        if len(near):
+            closest[near], normal[near], inside[near] = self.exact.query(points[near])
+        return closest, normal, inside
@@ -0,0 +1,93 @@
+import numpy as np
+
+#Fixed resolution lookup table for a curve ramp. The curve is sampled once
+#through any callable and rebuilt only when its entries change.
+
+RAMP_TOLERANCE = 0.001
+MIN_RESOLUTION = 32
+MAX_RESOLUTION = 4096
+
+#interpolation of a ramp entry, in the order of MRampAttribute's kNone, kLinear, kSmooth and kSpline
+RAMP_INTERPOLATIONS = ("none", "linear", "smooth", "spline")
+
+
+def ramp_curve(entries):
+    #sampler of a curve ramp given as (position, value, interpolation) entries,
+    #without Maya. Like MRampAttribute.getValueAtPosition, an entry's
+    #interpolation shapes the segment after it, spline segments are catmull-rom
+    #through the neighbouring entries and the ends are held
+    entries = sorted(entries)
+    positions = np.array([entry[0] for entry in entries], dtype=np.float64)
+    values = np.array([entry[1] for entry in entries], dtype=np.float64)
+    kinds = np.array([RAMP_INTERPOLATIONS.index(entry[2]) if isinstance(entry[2], str) else int(entry[2])
+                      for entry in entries], dtype=np.int64)
+
+    def sample(samplePositions):
+        samplePositions = np.asarray(samplePositions, dtype=np.float64)
+        if len(positions) < 2:
+            return np.full(samplePositions.shape, values[0] if len(values) else 0.0)
+        last = len(positions) - 1
+        segment = np.clip(np.searchsorted(positions, samplePositions, side="right") - 1, 0, last - 1)
+        width = positions[segment + 1] - positions[segment]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(width > 0, (samplePositions - positions[segment]) / width, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        before = values[np.maximum(segment - 1, 0)]
+        start = values[segment]
+        end = values[segment + 1]
+        after = values[np.minimum(segment + 2, last)]
+        kind = kinds[segment]
+
+        result = np.where(t < 1.0, start, end)
+        linear = start + (end - start) * t
+        result = np.where(kind == 1, linear, result)
+        result = np.where(kind == 2, start + (end - start) * t * t * (3.0 - 2.0 * t), result)
+        spline = 0.5 * (2.0 * start + (end - before) * t + (2.0 * before - 5.0 * start + 4.0 * end - after) * t * t +
+                        (3.0 * start - before - 3.0 * end + after) * t * t * t)
+        result = np.where(kind == 3, spline, result)
+        #outside the entries the first and the last value are held
+        result = np.where(samplePositions <= positions[0], values[0], result)
+        return np.where(samplePositions >= positions[last], values[last], result)
+    return sample
+
+
+class RampTable(object):
+    def __init__(self, tolerance=RAMP_TOLERANCE):
+        self.tolerance = tolerance
+        self.key = None
+        self.samplePositions = np.array([0.0, 1.0])
+        self.sampleValues = np.zeros(2)
+
+    def update(self, key, sampler, tolerance=None):
+        #key is anything comparable that describes the ramp, usually its entries
+        if tolerance is not None and tolerance != self.tolerance:
+            self.tolerance = tolerance
+            self.key = None
+        if key == self.key:
+            return False
+        self._build(sampler)
+        self.key = key
+        return True
+
+    def _build(self, sampler):
+        #double the resolution until the midpoints are within the tolerance
+        resolution = MIN_RESOLUTION
+        positions = np.linspace(0.0, 1.0, resolution + 1)
+        values = np.asarray(sampler(positions), dtype=np.float64)
+        while resolution < MAX_RESOLUTION:
+            midpoints = (positions[:-1] + positions[1:]) * 0.5
+            midValues = np.asarray(sampler(midpoints), dtype=np.float64)
+            error = np.abs(midValues - (values[:-1] + values[1:]) * 0.5).max()
+            merged = np.empty(resolution * 2 + 1)
+            merged[0::2] = values
+            merged[1::2] = midValues
+            resolution *= 2
+            positions = np.linspace(0.0, 1.0, resolution + 1)
+            values = merged
+            if error <= self.tolerance:
+                break
+        self.samplePositions = positions
+        self.sampleValues = values
+
+    def __call__(self, positions):
+        return np.interp(positions, self.samplePositions, self.sampleValues)
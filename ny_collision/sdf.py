@@ -0,0 +1,307 @@
+import copy
+
+import numpy as np
+
+from ny_collision.bvh import QUERY_BLOCK
+from ny_collision.core import MeshCollider, transform_points
+from ny_collision.geometry import _dot, _first_per_group, _normalize, closest_point_on_triangles
+
+#Narrow band signed distance field for rigid colliders. The field is built once
+#in the collider's local space, moving the collider only changes its matrix.
+#Every node within the band keeps its closest triangle, queries only test the
+#triangles of the surrounding nodes. Beyond the band only the sign is kept and
+#deep points ask the mesh itself.
+
+SDF_RESOLUTION = 64
+SDF_MEMORY = 64 * 1024 * 1024
+
+#bytes per grid node, float32 distance, int32 closest triangle and the exact flag
+NODE_BYTES = 9
+
+#triangle-node pairs evaluated at once while building
+BUILD_PAIRS = 2000000
+
+#most walks over neighbouring triangles a query takes
+RING_STEPS = 16
+
+
+def _dilate(mask):
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    grown[:, :, 1:] |= mask[:, :, :-1]
+    grown[:, :, :-1] |= mask[:, :, 1:]
+    return grown
+
+
+def _triangle_ring(triEdges, edgeCount):
+    #triangles sharing an edge with every triangle, short rows are padded with the triangle itself
+    triEdges = np.asarray(triEdges, dtype=np.int64)
+    if not len(triEdges):
+        return np.zeros((0, 1), dtype=np.int64)
+    edges = triEdges.ravel()
+    owners = np.repeat(np.arange(len(triEdges)), 3)
+    order = np.argsort(edges, kind="stable")
+    counts = np.bincount(edges, minlength=edgeCount)
+    starts = np.cumsum(counts) - counts
+    width = int(counts.max())
+    ring = np.repeat(np.arange(len(triEdges))[:, None], 3 * width, axis=1)
+    for side in range(3):
+        edge = triEdges[:, side]
+        for slot in range(width):
+            has = slot < counts[edge]
+            ring[has, side * width + slot] = owners[order[starts[edge[has]] + slot]]
+    return ring
+
+
+def _closest_candidates(points, candidates, corners):
+    #closest point over a row of candidate triangles for every point
+    a, b, c = corners
+    closest = closest_point_on_triangles(points[:, None], a[candidates], b[candidates], c[candidates])
+    delta = closest - points[:, None]
+    distance = _dot(delta, delta)
+    column = distance.argmin(axis=1)
+    rows = np.arange(len(points))
+    return closest[rows, column], candidates[rows, column], distance[rows, column]
+
+
+class SignedDistanceField(object):
+    def __init__(self, mesh, band, resolution=SDF_RESOLUTION, maxBytes=SDF_MEMORY):
+        self.band = float(band)
+        lo, hi = mesh.points.min(axis=0), mesh.points.max(axis=0)
+        extent = float((hi - lo).max())
+        voxel = max(extent / max(resolution, 1), 1e-6)
+        #the grid needs a little room past the band so the corners of samples within it stay exact
+        while True:
+            padding = self.band + voxel * 2
+            dims = np.ceil((hi - lo + padding * 2) / voxel).astype(np.int64) + 1
+            if dims.prod() * NODE_BYTES <= maxBytes:
+                break
+            voxel *= 1.25
+        self.voxel = voxel
+        self.origin = lo - padding
+        self.dims = dims
+        self._build(mesh)
+
+    def nbytes(self):
+        return self.distance.nbytes + self.faces.nbytes + self.exact.nbytes
+
+    def _build(self, mesh):
+        nodeCount = int(self.dims.prod())
+        best = np.full(nodeCount, np.inf)
+        bestFace = np.zeros(nodeCount, dtype=np.int64)
+        a, b, c = mesh.bvh.corners
+
+        def update(nodes, faces):
+            positions = self.origin + np.stack(np.unravel_index(nodes, self.dims), axis=-1) * self.voxel
+            closest = closest_point_on_triangles(positions, a[faces], b[faces], c[faces])
+            distance = _dot(positions - closest, positions - closest)
+            pick = _first_per_group(nodes, distance)
+            pick = pick[distance[pick] < best[nodes[pick]]]
+            best[nodes[pick]] = distance[pick]
+            bestFace[nodes[pick]] = faces[pick]
+
+        #exact distances for the nodes right next to the surface
+        seed = self.voxel * 1.5
+        low = np.clip(np.ceil((np.minimum(np.minimum(a, b), c) - seed - self.origin) / self.voxel), 0, self.dims - 1)
+        high = np.clip(np.floor((np.maximum(np.maximum(a, b), c) + seed - self.origin) / self.voxel), 0, self.dims - 1)
+        low = low.astype(np.int64)
+        spans = np.maximum(high.astype(np.int64) - low + 1, 0)
+        sizes = spans.prod(axis=1)
+        start = 0
+        while start < len(sizes):
+            end = start + max(1, int(np.searchsorted(np.cumsum(sizes[start:]), BUILD_PAIRS)))
+            tris = np.arange(start, min(end, len(sizes)))
+            start = end
+            counts = sizes[tris]
+            pairTris = np.repeat(tris, counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            span = spans[pairTris]
+            cells = low[pairTris] + np.stack((offsets // (span[:, 1] * span[:, 2]),
+                                              (offsets // span[:, 2]) % span[:, 1],
+                                              offsets % span[:, 2]), axis=-1)
+            update((cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2], pairTris)
+
+        #only the seeds within reach of their own triangle boxes are known to be exact
+        best[best > seed * seed] = np.inf
+
+        #the rest of the band inherits the closest triangles of its neighbours
+        steps = np.array([[i, j, k] for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+                          if (i, j, k) != (0, 0, 0)])
+        reach = self.band + self.voxel * 2
+        #the front grows along the axes, diagonals take up to sqrt(3) times as many layers
+        for layer in range(int(np.ceil(reach * np.sqrt(3) / self.voxel)) + 1):
+            resolved = np.isfinite(best).reshape(tuple(self.dims))
+            front = np.flatnonzero((_dilate(resolved) & ~resolved).ravel())
+            if not len(front):
+                break
+            cells = np.stack(np.unravel_index(front, self.dims), axis=-1)
+            pairNodes = []
+            pairFaces = []
+            for step in steps:
+                neighbour = cells + step
+                valid = ((neighbour >= 0) & (neighbour < self.dims)).all(axis=1)
+                ids = np.ravel_multi_index(tuple(neighbour[valid].T), self.dims)
+                known = np.isfinite(best[ids])
+                pairNodes.append(front[valid][known])
+                pairFaces.append(bestFace[ids[known]])
+            #neighbours mostly share their triangles, every pair is tested once
+            pairs = np.unique(np.concatenate(pairNodes) * len(a) + np.concatenate(pairFaces))
+            update(pairs // len(a), pairs % len(a))
+
+        #signs inside the band come from the pseudo normals, the band is kept two
+        #voxels wider so every corner of a sample within band is exact
+        exact = best <= reach * reach
+        ids = np.flatnonzero(exact)
+        cells = np.stack(np.unravel_index(ids, self.dims), axis=-1)
+        positions = self.origin + cells * self.voxel
+        faces = bestFace[ids]
+        closest = closest_point_on_triangles(positions, a[faces], b[faces], c[faces])
+        inside = mesh.classify(positions, closest, faces)
+
+        #beyond the band, whatever the border reaches without crossing it is outside
+        exact = exact.reshape(tuple(self.dims))
+        outside = np.zeros_like(exact)
+        outside[[0, -1]] = True
+        outside[:, [0, -1]] = True
+        outside[:, :, [0, -1]] = True
+        outside &= ~exact
+        while True:
+            grown = _dilate(outside) & ~exact
+            if (grown == outside).all():
+                break
+            outside = grown
+
+        distance = np.where(outside, self.band, -self.band).astype(np.float32).ravel()
+        distance[ids] = np.where(inside, -1.0, 1.0) * np.sqrt(best[ids])
+        self.distance = distance.reshape(tuple(self.dims))
+        self.faces = bestFace.astype(np.int32).reshape(tuple(self.dims))
+        self.exact = exact
+
+    def sample(self, points):
+        #trilinear distance, the closest triangles of the 8 corners and whether all of them were exact
+        grid = (points - self.origin) / self.voxel
+        base = np.clip(np.floor(grid).astype(np.int64), 0, self.dims - 2)
+        fraction = np.clip(grid - base, 0.0, 1.0)
+        inGrid = ((grid >= 0) & (grid <= self.dims - 1)).all(axis=1)
+
+        x, y, z = base[:, 0], base[:, 1], base[:, 2]
+        distance = np.zeros(len(points))
+        faces = np.empty((len(points), 8), dtype=np.int64)
+        exact = inGrid.copy()
+        corner = 0
+        for i in (0, 1):
+            for j in (0, 1):
+                for k in (0, 1):
+                    weight = ((fraction[:, 0] if i else 1 - fraction[:, 0]) *
+                              (fraction[:, 1] if j else 1 - fraction[:, 1]) *
+                              (fraction[:, 2] if k else 1 - fraction[:, 2]))
+                    distance += self.distance[x + i, y + j, z + k] * weight
+                    faces[:, corner] = self.faces[x + i, y + j, z + k]
+                    exact &= self.exact[x + i, y + j, z + k]
+                    corner += 1
+        distance[~inGrid] = self.band
+        return distance, faces, exact
+
+
+class RigidCollider(object):
+    #mesh collider that only moves by its matrix, queries sample the field
+    def __init__(self, localPoints, triangles, matrix, band, resolution=SDF_RESOLUTION, maxBytes=SDF_MEMORY):
+        self.mesh = MeshCollider(localPoints, triangles)
+        self.localPoints = self.mesh.points
+        self.ring = _triangle_ring(self.mesh.triEdges, self.mesh.edgeCount)
+        self.field = SignedDistanceField(self.mesh, band, resolution, maxBytes)
+        self.set_matrix(matrix)
+
+    def set_matrix(self, matrix, bboxMin=None, bboxMax=None):
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(4, 4)
+        self.inverseMatrix = np.linalg.inv(self.matrix)
+        if bboxMin is None or bboxMax is None:
+            lo, hi = self.mesh.bounds()
+            corners = np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+            corners = transform_points(corners, self.matrix)
+            bboxMin, bboxMax = corners.min(axis=0), corners.max(axis=0)
+        self.bboxMin = np.asarray(bboxMin, dtype=np.float64)
+        self.bboxMax = np.asarray(bboxMax, dtype=np.float64)
+
+    def moved(self, matrix, bboxMin=None, bboxMax=None):
+        #the same field at another matrix, the field and the mesh are shared
+        collider = copy.copy(self)
+        collider.set_matrix(matrix, bboxMin, bboxMax)
+        return collider
+
+    def bounds(self):
+        return self.bboxMin, self.bboxMax
+
+    def snapshot(self):
+        #the local points tell a rebuilt field from the one it replaced
+        return np.concatenate((self.bboxMin, self.bboxMax, self.matrix.ravel(), self.localPoints.ravel()))
+
+    def matches(self, points, matrix, tolerance=1e-5):
+        #true while the world space points are the ones the field was built from
+        #moved by matrix. The rounding of float32 mesh points grows with their
+        #distance from the origin, so they are compared in world space
+        points = np.asarray(points, dtype=np.float64)
+        if points.shape != self.localPoints.shape:
+            return False
+        if not len(points):
+            return True
+        expected = transform_points(self.localPoints, matrix)
+        scale = max(1.0, float(np.abs(points).max()))
+        return bool(np.abs(points - expected).max() <= tolerance * scale)
+
+    def _local_query(self, points):
+        local = transform_points(points, self.inverseMatrix)
+        distance, cornerFaces, exact = self.field.sample(local)
+        closest = np.full((len(points), 3), np.inf)
+        normal = np.zeros((len(points), 3))
+        inside = np.zeros(len(points), dtype=bool)
+
+        #within the band the search starts from the corners' closest triangles and
+        #walks over the neighbouring triangles until none of them is closer
+        near = np.flatnonzero(exact)
+        if len(near):
+            nearPoints = local[near]
+            nearClosest, faces, best = _closest_candidates(nearPoints, cornerFaces[near], self.mesh.bvh.corners)
+            walking = np.arange(len(near))
+            for step in range(RING_STEPS):
+                stepClosest, stepFaces, stepDistance = _closest_candidates(
+                    nearPoints[walking], self.ring[faces[walking]], self.mesh.bvh.corners)
+                better = stepDistance < best[walking]
+                walking = walking[better]
+                if not len(walking):
+                    break
+                nearClosest[walking] = stepClosest[better]
+                faces[walking] = stepFaces[better]
+                best[walking] = stepDistance[better]
+            closest[near] = nearClosest
+            normal[near] = self.mesh.faceNormals[faces]
+            inside[near] = self.mesh.classify(nearPoints, nearClosest, faces)
+
+        #deep or unsampled points inside the collider ask the mesh itself
+        deep = np.flatnonzero(~exact & (distance < 0))
+        if len(deep):
+            closest[deep], normal[deep], inside[deep] = self.mesh.query(local[deep])
+
+        #everything else is further than the band
+        far = ~exact & (distance >= 0)
+        return closest, normal, inside, far
+
+    def query(self, points):
+        #closest point, face normal and inside flag in world space, closest points are inf beyond the band
+        points = np.asarray(points, dtype=np.float64)
+        world = np.full((len(points), 3), np.inf)
+        normal = np.zeros((len(points), 3))
+        inside = np.zeros(len(points), dtype=bool)
+        for start in range(0, len(points), QUERY_BLOCK):
+            block = slice(start, min(start + QUERY_BLOCK, len(points)))
+            closest, normal[block], inside[block], far = self._local_query(points[block])
+            world[block][~far] = transform_points(closest[~far], self.matrix)
+        normal = _normalize(np.dot(normal, self.inverseMatrix[:3, :3].T))
+        return world, normal, inside
+
+    def closest_point(self, points):
+        closest = self.query(points)[0]
+        return closest, np.full(len(points), -1, dtype=np.int64)
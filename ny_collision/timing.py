@@ -0,0 +1,93 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+
+#Wall clock time and vertex counts of every stage of the deformation. Stages
+#are only measured when a timer is passed in, otherwise they share a context
+#that does nothing and no count is taken.
+
+STAGES = ("weights", "colliders", "culling", "inside", "pushout", "bulge", "smoothing", "writeback")
+
+#tested: vertices tested against the collider boxes, culled: tested vertices
+#outside every box, skippedColliders: colliders whose box no vertex is in
+COUNTS = ("tested", "culled", "inside", "bulged", "smoothed", "skippedColliders")
+
+#size of a profile log file before it is rolled over, and the old files kept
+LOG_BYTES = 1048576
+LOG_BACKUPS = 3
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.times = OrderedDict((name, 0.0) for name in STAGES)
+        self.counts = OrderedDict((name, 0) for name in COUNTS)
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def total(self):
+        return sum(self.times.values())
+
+    def stats(self):
+        return {"times": dict(self.times), "counts": dict(self.counts), "total": self.total()}
+
+
+class StageLog(object):
+    #rolling log file with one JSON line per evaluation
+    def __init__(self, path, maxBytes=LOG_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.handler = RotatingFileHandler(path, maxBytes=maxBytes, backupCount=backups, delay=True)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, timer, **fields):
+        entry = dict(fields, date=time.strftime("%Y-%m-%d %H:%M:%S"), **timer.stats())
+        self.handler.emit(logging.makeLogRecord({"msg": json.dumps(entry, sort_keys=True)}))
+
+    def close(self):
+        self.handler.close()
+
+
+def stage(timer, name):
+    #context timing a stage on timer, nothing is measured when timer is None
+    return NULL_STAGE if timer is None else timer.stage(name)
+
+
+def count(timer, name, value):
+    if timer is not None:
+        timer.count(name, value)
@@ -1,14 +1,33 @@
+import ctypes
+import zlib
+
+import numpy as np
+
 from maya import OpenMaya as om
 from maya import OpenMayaMPx as ommpx
 from maya import cmds
 from maya.mel import eval as meval
 
+from ny_collision import core
+from ny_collision.adjacency import Adjacency
+from ny_collision.buffers import PRECISIONS, DeformBuffers
+from ny_collision.cache import shared_cache
+from ny_collision.incremental import MOVED_THRESHOLD, IncrementalDeformer
+from ny_collision.plastic import CHECKPOINT_INTERVAL, CHECKPOINT_MEMORY, ELASTICITY_MODES, PlasticDeformer
+from ny_collision.primitives import PRIMITIVE_TYPES, primitive_collider
+from ny_collision.proxy import ProxyCollider
+from ny_collision.ramp import RAMP_TOLERANCE, RampTable
+from ny_collision.sdf import SDF_MEMORY, SDF_RESOLUTION, RigidCollider
+from ny_collision.timing import COUNTS, STAGES, StageLog, StageTimer, stage
+
 #AUTHOR = Nazmi Yazici
 #EMAIL = nazmiprinter@gmail.com
 #WEBSITE = nazmiprinter.com
 #DATE = 23/10/2020
 
-#TODO: Add elasticity
+#optionVar holding the shared collider cache budget in megabytes, the cache is
+#process wide so its budget is one setting for every node
+CACHE_MEMORY_OPTION = "nyCollisionCacheMemory"
 
 class NyCollisionDeformer(ommpx.MPxDeformerNode):
     NODE_NAME = "nyCollisionDeformer"
@@ -17,6 +36,24 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
     def __init__(self):
         super(NyCollisionDeformer, self).__init__()
         self.firstTime = 1
+        self.topologyCache = {}
+        self.bulgeTable = RampTable()
+        self.weightCache = {}
+        self.weightGeneration = 0
+        self.incrementalCache = {}
+        self.plasticCache = {}
+        self.bufferCache = {}
+        self.timer = StageTimer()
+        self.profileLog = None
+
+    def setDependentsDirty(self, plug, plugArray):
+        #painted weights are read again only after they change
+        weightList = ommpx.cvar.MPxDeformerNode_weightList
+        weights = ommpx.cvar.MPxDeformerNode_weights
+        if plug == weightList or plug == weights:
+            self.weightCache.clear()
+            self.weightGeneration += 1
+        return ommpx.MPxDeformerNode.setDependentsDirty(self, plug, plugArray)
 
     @classmethod
     def creator(cls):
@@ -32,14 +69,42 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         cls.bulgeRamp = om.MObject()
         cls.bulgeDistance = om.MObject()
         cls.bulgeStrength = om.MObject()
+        cls.bulgeRampTolerance = om.MObject()
+        cls.colliderMatrixList = om.MObject()
+        cls.rigidList = om.MObject()
+        cls.proxyErrorList = om.MObject()
+        cls.exactPushout = om.MObject()
+        cls.sdfResolution = om.MObject()
+        cls.sdfMemoryLimit = om.MObject()
+        cls.primitiveType = om.MObject()
+        cls.primitiveMatrix = om.MObject()
+        cls.primitiveRadius = om.MObject()
+        cls.primitiveHeight = om.MObject()
+        cls.primitiveSize = om.MObject()
+        cls.primitiveList = om.MObject()
         cls.smooth = om.MObject()
-        #cls.elasticity = om.MObject()
+        cls.incremental = om.MObject()
+        cls.incrementalThreshold = om.MObject()
+        cls.workers = om.MObject()
+        cls.precision = om.MObject()
+        cls.profile = om.MObject()
+        cls.profileLog = om.MObject()
+        cls.profileTimes = om.MObject()
+        cls.profileCounts = om.MObject()
+        cls.elasticity = om.MObject()
+        cls.currentTime = om.MObject()
+        cls.startFrame = om.MObject()
+        cls.checkpointInterval = om.MObject()
+        cls.checkpointMemoryLimit = om.MObject()
+        cls.checkpointCompress = om.MObject()
         
         #function sets
         compAttr = om.MFnCompoundAttribute()
         numAttr = om.MFnNumericAttribute()
         typedAttr = om.MFnTypedAttribute()
-        #enumAttr = om.MFnEnumAttribute()
+        matrixAttr = om.MFnMatrixAttribute()
+        unitAttr = om.MFnUnitAttribute()
+        enumAttr = om.MFnEnumAttribute()
         rampAttr = om.MRampAttribute()
 
         #collider array
@@ -71,14 +136,106 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         compAttr.setReadable(False)
         compAttr.setDisconnectBehavior(0)
 
-        """
+        #collider matrix array
+        cls.colliderMatrixList = matrixAttr.create("colliderMatrixList", "colmtxlist")
+        matrixAttr.setArray(True)
+        matrixAttr.setReadable(False)
+        matrixAttr.setDisconnectBehavior(0)
+        cls.addAttribute(cls.colliderMatrixList)
+
+        #rigid collider array
+        cls.rigidList = numAttr.create("rigidList", "rigidlist", om.MFnNumericData.kBoolean, False)
+        numAttr.setArray(True)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.rigidList)
+
+        #decimated query proxy of every collider, 0 queries the collider itself
+        cls.proxyErrorList = numAttr.create("proxyErrorList", "prxerrlist", om.MFnNumericData.kFloat, 0.0)
+        numAttr.setArray(True)
+        numAttr.setMin(0.0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.proxyErrorList)
+
+        cls.exactPushout = numAttr.create("exactPushout", "expush", om.MFnNumericData.kBoolean, False)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.exactPushout)
+
+        #rigid collider distance field
+        cls.sdfResolution = numAttr.create("sdfResolution", "sdfres", om.MFnNumericData.kInt, SDF_RESOLUTION)
+        numAttr.setMin(8)
+        numAttr.setMax(512)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.sdfResolution)
+
+        cls.sdfMemoryLimit = numAttr.create("sdfMemoryLimit", "sdfmem", om.MFnNumericData.kFloat, SDF_MEMORY / 1048576.0)
+        numAttr.setMin(1.0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.sdfMemoryLimit)
+
+        #analytic collider array
+        cls.primitiveType = enumAttr.create("primitiveType", "primtype", 0)
+        for index, name in enumerate(PRIMITIVE_TYPES):
+            enumAttr.addField(name, index)
+        enumAttr.setKeyable(False)
+        cls.addAttribute(cls.primitiveType)
+
+        cls.primitiveMatrix = matrixAttr.create("primitiveMatrix", "primmtx")
+        matrixAttr.setReadable(False)
+        cls.addAttribute(cls.primitiveMatrix)
+
+        cls.primitiveRadius = numAttr.create("primitiveRadius", "primrad", om.MFnNumericData.kFloat, 1.0)
+        numAttr.setMin(0.0)
+        numAttr.setKeyable(True)
+        cls.addAttribute(cls.primitiveRadius)
+
+        cls.primitiveHeight = numAttr.create("primitiveHeight", "primhgt", om.MFnNumericData.kFloat, 2.0)
+        numAttr.setMin(0.0)
+        numAttr.setKeyable(True)
+        cls.addAttribute(cls.primitiveHeight)
+
+        cls.primitiveSize = numAttr.create("primitiveSize", "primsize", om.MFnNumericData.k3Float, 1.0)
+        numAttr.setKeyable(True)
+        cls.addAttribute(cls.primitiveSize)
+
+        cls.primitiveList = compAttr.create("primitiveList", "primlist")
+        compAttr.addChild(cls.primitiveType)
+        compAttr.addChild(cls.primitiveMatrix)
+        compAttr.addChild(cls.primitiveRadius)
+        compAttr.addChild(cls.primitiveHeight)
+        compAttr.addChild(cls.primitiveSize)
+        compAttr.setArray(True)
+        compAttr.setDisconnectBehavior(0)
+        cls.addAttribute(cls.primitiveList)
+
         #elasticity
         cls.elasticity = enumAttr.create("elasticity", "elas")
-        enumAttr.addField("elastic", 0)
-        enumAttr.addField("plastic", 1)
+        for index, name in enumerate(ELASTICITY_MODES):
+            enumAttr.addField(name, index)
         enumAttr.setKeyable(True)
         cls.addAttribute(cls.elasticity)
-        """
+
+        #plastic state is carried from frame to frame
+        cls.currentTime = unitAttr.create("currentTime", "time", om.MFnUnitAttribute.kTime, 1.0)
+        unitAttr.setKeyable(False)
+        cls.addAttribute(cls.currentTime)
+
+        cls.startFrame = numAttr.create("startFrame", "stf", om.MFnNumericData.kFloat, 1.0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.startFrame)
+
+        cls.checkpointInterval = numAttr.create("checkpointInterval", "cpint", om.MFnNumericData.kInt, CHECKPOINT_INTERVAL)
+        numAttr.setMin(1)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.checkpointInterval)
+
+        cls.checkpointMemoryLimit = numAttr.create("checkpointMemoryLimit", "cpmem", om.MFnNumericData.kFloat, CHECKPOINT_MEMORY / 1048576.0)
+        numAttr.setMin(0.0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.checkpointMemoryLimit)
+
+        cls.checkpointCompress = numAttr.create("checkpointCompress", "cpcmp", om.MFnNumericData.kBoolean, False)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.checkpointCompress)
 
         #smooth
         cls.smooth = numAttr.create("smoothIterations", "smt", om.MFnNumericData.kInt)
@@ -87,6 +244,49 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         numAttr.setKeyable(True)
         cls.addAttribute(cls.smooth)
 
+        #incremental evaluation
+        cls.incremental = numAttr.create("incremental", "inc", om.MFnNumericData.kBoolean, False)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.incremental)
+
+        cls.incrementalThreshold = numAttr.create("incrementalThreshold", "incthr", om.MFnNumericData.kFloat, MOVED_THRESHOLD)
+        numAttr.setMin(0.0)
+        numAttr.setMax(1.0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.incrementalThreshold)
+
+        #worker threads, 0 uses every core. One until scaling inside the DG has been measured
+        cls.workers = numAttr.create("workers", "wrk", om.MFnNumericData.kInt, 1)
+        numAttr.setMin(0)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.workers)
+
+        #precision of the point, normal and weight buffers
+        cls.precision = enumAttr.create("precision", "prec", 0)
+        for index, name in enumerate(PRECISIONS):
+            enumAttr.addField(name, index)
+        enumAttr.setKeyable(False)
+        cls.addAttribute(cls.precision)
+
+        #profiling, stage times and counts of the last evaluation in STAGES and COUNTS order
+        cls.profile = numAttr.create("profile", "prof", om.MFnNumericData.kBoolean, False)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.profile)
+
+        cls.profileLog = typedAttr.create("profileLog", "proflog", om.MFnData.kString)
+        typedAttr.setKeyable(False)
+        cls.addAttribute(cls.profileLog)
+
+        cls.profileTimes = typedAttr.create("profileTimes", "proftime", om.MFnData.kDoubleArray)
+        typedAttr.setWritable(False)
+        typedAttr.setStorable(False)
+        cls.addAttribute(cls.profileTimes)
+
+        cls.profileCounts = typedAttr.create("profileCounts", "profcnt", om.MFnData.kIntArray)
+        typedAttr.setWritable(False)
+        typedAttr.setStorable(False)
+        cls.addAttribute(cls.profileCounts)
+
         #bulge distance
         cls.bulgeDistance = numAttr.create("bulgeDistance", "buldist", om.MFnNumericData.kFloat)
         numAttr.setMin(0.0)
@@ -104,17 +304,46 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         cls.bulgeRamp = rampAttr.createCurveRamp("bulgeRamp", "bulcrv")
         cls.addAttribute(cls.bulgeRamp)
 
+        #bulge ramp sampling tolerance
+        cls.bulgeRampTolerance = numAttr.create("bulgeRampTolerance", "bultol", om.MFnNumericData.kFloat, RAMP_TOLERANCE)
+        numAttr.setMin(0.000001)
+        numAttr.setKeyable(False)
+        cls.addAttribute(cls.bulgeRampTolerance)
+
         #connections
         outputGeom = ommpx.cvar.MPxGeometryFilter_outputGeom
         cls.attributeAffects(cls.colliderList, outputGeom)
         cls.attributeAffects(cls.boundingBoxMin, outputGeom)
         cls.attributeAffects(cls.boundingBoxMax, outputGeom)
         cls.attributeAffects(cls.boundingBoxComp, outputGeom)
-        #cls.attributeAffects(cls.elasticity, outputGeom)
+        cls.attributeAffects(cls.colliderMatrixList, outputGeom)
+        cls.attributeAffects(cls.rigidList, outputGeom)
+        cls.attributeAffects(cls.proxyErrorList, outputGeom)
+        cls.attributeAffects(cls.exactPushout, outputGeom)
+        cls.attributeAffects(cls.sdfResolution, outputGeom)
+        cls.attributeAffects(cls.sdfMemoryLimit, outputGeom)
+        cls.attributeAffects(cls.primitiveType, outputGeom)
+        cls.attributeAffects(cls.primitiveMatrix, outputGeom)
+        cls.attributeAffects(cls.primitiveRadius, outputGeom)
+        cls.attributeAffects(cls.primitiveHeight, outputGeom)
+        cls.attributeAffects(cls.primitiveSize, outputGeom)
+        cls.attributeAffects(cls.primitiveList, outputGeom)
+        cls.attributeAffects(cls.elasticity, outputGeom)
+        cls.attributeAffects(cls.currentTime, outputGeom)
+        cls.attributeAffects(cls.startFrame, outputGeom)
+        cls.attributeAffects(cls.checkpointInterval, outputGeom)
+        cls.attributeAffects(cls.checkpointMemoryLimit, outputGeom)
+        cls.attributeAffects(cls.checkpointCompress, outputGeom)
         cls.attributeAffects(cls.smooth, outputGeom)
+        cls.attributeAffects(cls.incremental, outputGeom)
+        cls.attributeAffects(cls.incrementalThreshold, outputGeom)
+        cls.attributeAffects(cls.workers, outputGeom)
+        cls.attributeAffects(cls.precision, outputGeom)
+        cls.attributeAffects(cls.profile, outputGeom)
         cls.attributeAffects(cls.bulgeRamp, outputGeom)
         cls.attributeAffects(cls.bulgeDistance, outputGeom)
         cls.attributeAffects(cls.bulgeStrength, outputGeom)
+        cls.attributeAffects(cls.bulgeRampTolerance, outputGeom)
 
     def deform(self, dataBlock, geoIter, matrix, geoIndex):
         #input geo
@@ -125,72 +354,53 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         inputGeomGet = ommpx.cvar.MPxGeometryFilter_inputGeom
         inputGeom = inputElement.child(inputGeomGet).asMesh()
         defMeshFN = om.MFnMesh(inputGeom)
+
+        #output geo
+        outputGet = ommpx.cvar.MPxGeometryFilter_outputGeom
+        outputHandle = dataBlock.outputArrayValue(outputGet)
+        outputHandle.jumpToElement(geoIndex)
+        outMeshFN = om.MFnMesh(outputHandle.outputValue().asMesh())
     
         #variables
         thisNode = om.MFnDependencyNode(self.thisMObject())
         thisNodeObj = self.thisMObject()
-        maxDistance = 0.0
-        colliderBBox = om.MBoundingBox()
-        collidingList = om.MIntArray()
-        closePoint = om.MPoint()
-        closeNormal = om.MVector()
-        normals = om.MFloatVectorArray()
-        defMeshFN.getVertexNormals(False, normals)
-        pointList = om.MPointArray()
-        defMeshFN.getPoints(pointList)
-        pointLen = pointList.length()
-        endPointList = om.MPointArray()
-        endPointList.setLength(pointLen)
         colliderIndexList = om.MIntArray()
 
-        #allIntersections flags
-        faceIDs = None
-        triIDs = None
-        IDsSorted = False
-        space = om.MSpace.kWorld
-        maxParam = 100000
-        testBothIndirectDirections = False
-        accelParams = defMeshFN.autoUniformGridParams()
-        sortHits = False
-        hitPoints = om.MFloatPointArray()
-        hitRayParams = om.MFloatArray()
-        hitFaces = None
-        hitTris = None
-        hitBarys1= None
-        hitBarys2 = None
-        tolerance = 0.0001
-
         #elasticity value
-        #elasticityValue = dataBlock.inputValue(NyCollisionDeformer.elasticity).asShort()
+        elasticityValue = dataBlock.inputValue(NyCollisionDeformer.elasticity).asShort()
 
         #smooth
         smoothValue = dataBlock.inputValue(NyCollisionDeformer.smooth).asInt()
 
+        #incremental
+        incrementalValue = dataBlock.inputValue(NyCollisionDeformer.incremental).asBool()
+        incrementalThresholdValue = dataBlock.inputValue(NyCollisionDeformer.incrementalThreshold).asFloat()
+
+        #threads and precision
+        workersValue = dataBlock.inputValue(NyCollisionDeformer.workers).asInt()
+        precisionValue = PRECISIONS[dataBlock.inputValue(NyCollisionDeformer.precision).asShort()]
+
+        #profiling, nothing is measured while it is off
+        timer = None
+        if dataBlock.inputValue(NyCollisionDeformer.profile).asBool():
+            timer = self.timer
+            timer.reset()
+
         #bulge values
         bulgeHandle = om.MRampAttribute(thisNodeObj, NyCollisionDeformer.bulgeRamp)
         bulgeStrengthValue = dataBlock.inputValue(NyCollisionDeformer.bulgeStrength).asFloat()
         bulgeDistanceValue = dataBlock.inputValue(NyCollisionDeformer.bulgeDistance).asFloat()
-
-        bulgeMUtil = om.MScriptUtil()
-        bulgeResultMUtil = om.MScriptUtil()
-        bulgeValue = bulgeMUtil.asFloatPtr()
+        bulgeToleranceValue = dataBlock.inputValue(NyCollisionDeformer.bulgeRampTolerance).asFloat()
 
         if self.firstTime == 1:
             bulgePosArray = om.MFloatArray()
             bulgeValArray = om.MFloatArray()
             bulgeInterpArray = om.MIntArray()
 
-            bulgePosArray.append(0.000)
-            bulgePosArray.append(0.250)
-            bulgePosArray.append(1.000)
-
-            bulgeValArray.append(0.000)
-            bulgeValArray.append(0.900)
-            bulgeValArray.append(0.000)
-
-            bulgeInterpArray.append(om.MRampAttribute.kSpline)
-            bulgeInterpArray.append(om.MRampAttribute.kSpline)
-            bulgeInterpArray.append(om.MRampAttribute.kSpline)
+            for bulgePos, bulgeVal in zip(core.BULGE_RAMP_POSITIONS, core.BULGE_RAMP_VALUES):
+                bulgePosArray.append(bulgePos)
+                bulgeValArray.append(bulgeVal)
+                bulgeInterpArray.append(om.MRampAttribute.kSpline)
             bulgeHandle.addEntries(bulgePosArray, bulgeValArray, bulgeInterpArray)
 
             self.firstTime = 0
@@ -203,154 +413,448 @@ class NyCollisionDeformer(ommpx.MPxDeformerNode):
         #custom inputs
         colliderListHandle = dataBlock.inputArrayValue(NyCollisionDeformer.colliderList)
         boundingBoxCompHandle = dataBlock.inputArrayValue(NyCollisionDeformer.boundingBoxComp)
+        colliderMatrixHandle = dataBlock.inputArrayValue(NyCollisionDeformer.colliderMatrixList)
+        rigidHandle = dataBlock.inputArrayValue(NyCollisionDeformer.rigidList)
+        proxyErrorHandle = dataBlock.inputArrayValue(NyCollisionDeformer.proxyErrorList)
+        exactPushoutValue = dataBlock.inputValue(NyCollisionDeformer.exactPushout).asBool()
+        sdfResolutionValue = dataBlock.inputValue(NyCollisionDeformer.sdfResolution).asInt()
+        sdfMemoryValue = int(dataBlock.inputValue(NyCollisionDeformer.sdfMemoryLimit).asFloat() * 1048576)
+        primitiveListHandle = dataBlock.inputArrayValue(NyCollisionDeformer.primitiveList)
 
-        if colliderListHandle.elementCount() < 1:
+        if colliderListHandle.elementCount() < 1 and primitiveListHandle.elementCount() < 1:
             return
 
-        if boundingBoxCompHandle.elementCount() < 1:
+        if colliderListHandle.elementCount() > 0 and boundingBoxCompHandle.elementCount() < 1:
             return
     
         #finding plugs that has connection
         colliderListPlug = thisNode.findPlug("colliderList", False)
         for i in range(colliderListHandle.elementCount()):
             item = colliderListPlug.elementByPhysicalIndex(i)
-            index = int(item.name()[-2])
-            colliderIndexList.append(index)
-        
-        #deformation
-        for col in range(colliderIndexList.length()):
-            colliderListHandle.jumpToElement(colliderIndexList[col])
-            colliderInput = colliderListHandle.inputValue().asMesh()
-            colMeshFN = om.MFnMesh(colliderInput)
-            boundingBoxCompHandle.jumpToElement(colliderIndexList[col])
-            toChild = boundingBoxCompHandle.inputValue()
-            boundingBoxMinValue = toChild.child(NyCollisionDeformer.boundingBoxMin).asFloat3()
-            boundingBoxMaxValue = toChild.child(NyCollisionDeformer.boundingBoxMax).asFloat3()
-            colbboxmin = om.MPoint(boundingBoxMinValue[0], boundingBoxMinValue[1], boundingBoxMinValue[2])
-            colbboxmax = om.MPoint(boundingBoxMaxValue[0], boundingBoxMaxValue[1], boundingBoxMaxValue[2])
-            colliderBBox.expand(colbboxmin)
-            colliderBBox.expand(colbboxmax)
-
-            #direct deformation
-            while not geoIter.isDone():
-                weightValue = self.weightValue(dataBlock, geoIndex, geoIter.index())
-                if weightValue == 0:
-                    geoIter.next()
-                else:
-                    point = geoIter.position() * matrix
-                    if colliderBBox.contains(point):
-                        raySource = om.MFloatPoint(point[0], point[1], point[2], 1.0)
-                        normal = normals[geoIter.index()]
-                        rayDir = om.MFloatVector(normal[0], normal[1], normal[2])
-                        hit = colMeshFN.allIntersections(raySource, rayDir, faceIDs, triIDs, IDsSorted,
-                                                        space, maxParam, testBothIndirectDirections,
-                                                        accelParams, sortHits, hitPoints,
-                                                        hitRayParams, hitFaces, hitTris, hitBarys1,
-                                                        hitBarys2, tolerance)               
-                        if hit:
-                            colMeshFN.getClosestPoint(point, closePoint, space, None)
-                            colMeshFN.getClosestNormal(closePoint, closeNormal, space, None)
-                            delta = point - closePoint
-                            angle = delta * closeNormal
-                            if angle < 0:
-                                distance = point.distanceTo(closePoint)
-                                if distance > maxDistance:
-                                    maxDistance = distance
-                                endPoint = point - delta * weightValue * envelopeValue
-                                endPoint *= matrix.inverse()
-                                endPointList.set(endPoint, geoIter.index())
-                                collidingList.append(geoIter.index())
-                            else:
-                                endPointList.set(geoIter.position(), geoIter.index())
+            colliderIndexList.append(item.logicalIndex())
+
+        #bulk inputs
+        matrixArray = matrix_to_numpy(matrix)
+
+        #topology and adjacency are kept until the mesh's topology changes
+        faceCounts, faceConnects = mesh_topology(defMeshFN)
+        signature = mesh_signature(defMeshFN, (faceCounts, faceConnects))
+        topology = self.topologyCache.get(geoIndex)
+        if topology is None or topology[0] != signature:
+            adjacency = Adjacency.from_faces(faceCounts, faceConnects, defMeshFN.numVertices())
+            topology = (signature, faceCounts, faceConnects, adjacency, core.normal_indices(faceCounts, faceConnects))
+            self.topologyCache[geoIndex] = topology
+        signature, faceCounts, faceConnects, adjacency, normalIndices = topology
+
+        #points, normals and the result live in buffers kept until the point count or precision changes
+        pointLen = defMeshFN.numVertices()
+        buffers = self.bufferCache.setdefault(geoIndex, DeformBuffers())
+        buffers.resize(pointLen, precisionValue)
+
+        #weights and the compacted active vertex ids, only the members of the
+        #deformer set are active
+        with stage(timer, "weights"):
+            cached = self.weightCache.get(geoIndex)
+            memberCount = geoIter.count()
+            if (cached is None or len(cached[0]) != pointLen or cached[0].dtype != buffers.dtype
+                    or cached[2] != memberCount):
+                weights = read_weights(dataBlock, geoIndex, pointLen, buffers.dtype)
+                activeIds = core.active_vertices(weights)
+                if memberCount < pointLen:
+                    activeIds = np.intersect1d(activeIds, member_ids(geoIter), assume_unique=True)
+                cached = (weights, activeIds, memberCount)
+                self.weightCache[geoIndex] = cached
+        weights, activeIds, memberCount = cached
+        if not len(activeIds):
+            return
+
+        #the mesh's own float32 points are read and written in place
+        outPoints = raw_points(outMeshFN)
+        points = core.transform_points(outPoints, matrixArray, buffers.points)
+        normals = core.vertex_normals(points, faceCounts, faceConnects, buffers.normals, normalIndices)
+
+        with stage(timer, "colliders"):
+            colliders = []
+            colliderConfiguration = []
+            for col in range(colliderIndexList.length()):
+                colliderListHandle.jumpToElement(colliderIndexList[col])
+                colliderInput = colliderListHandle.inputValue().asMesh()
+                colMeshFN = om.MFnMesh(colliderInput)
+                boundingBoxCompHandle.jumpToElement(colliderIndexList[col])
+                toChild = boundingBoxCompHandle.inputValue()
+                boundingBoxMinValue = toChild.child(NyCollisionDeformer.boundingBoxMin).asFloat3()
+                boundingBoxMaxValue = toChild.child(NyCollisionDeformer.boundingBoxMax).asFloat3()
+
+                #acceleration data is shared by every node colliding with the same mesh
+                colIdentity = source_identity(colliderListPlug.elementByLogicalIndex(colliderIndexList[col]))
+                if colIdentity is None:
+                    colIdentity = (id(self), colliderIndexList[col])
+                colTopology = mesh_topology(colMeshFN)
+                colSignature = mesh_signature(colMeshFN, colTopology)
+                colPoints = raw_points(colMeshFN)
+                colMatrix = None
+                proxyError = array_element(proxyErrorHandle, colliderIndexList[col], 0.0, "asFloat")
+                if array_element(rigidHandle, colliderIndexList[col], False, "asBool"):
+                    colMatrix = array_element(colliderMatrixHandle, colliderIndexList[col], None, "asMatrix")
+
+                with shared_cache.lock:
+                    if colMatrix is not None:
+                        #rigid colliders keep their distance field while the points only move by the matrix
+                        colMatrix = matrix_to_numpy(colMatrix)
+                        key = (colIdentity, "rigid", colSignature, sdfResolutionValue, sdfMemoryValue)
+                        collider = shared_cache.get(key, lambda cached: cached.field.band >= bulgeDistanceValue
+                                                    and cached.matches(colPoints, colMatrix))
+                        if collider is None:
+                            localPoints = core.transform_points(colPoints, np.linalg.inv(colMatrix))
+                            colTriangles = core.triangulate(*colTopology)
+                            collider = shared_cache.put(key, RigidCollider(localPoints, colTriangles, colMatrix,
+                                                                           bulgeDistanceValue, sdfResolutionValue,
+                                                                           sdfMemoryValue))
+                        collider.set_matrix(colMatrix, boundingBoxMinValue, boundingBoxMaxValue)
+                    elif proxyError > 0:
+                        #dense colliders are queried through a decimated proxy kept per topology, nodes
+                        #that push out against the full mesh don't share it with the ones that don't
+                        key = (colIdentity, "proxy", colSignature, proxyError, exactPushoutValue)
+                        collider = shared_cache.get(key)
+                        if collider is None:
+                            colTriangles = core.triangulate(*colTopology)
+                            collider = shared_cache.put(key, ProxyCollider(colPoints, colTriangles, proxyError,
+                                                                           exactPushoutValue, boundingBoxMinValue,
+                                                                           boundingBoxMaxValue))
                         else:
-                            endPointList.set(geoIter.position(), geoIter.index())
+                            collider.update(colPoints, boundingBoxMinValue, boundingBoxMaxValue)
+                            #a rebuilt proxy changes its size
+                            shared_cache.remeasure(key)
                     else:
-                        endPointList.set(geoIter.position(), geoIter.index())
-                    geoIter.next()
-            
-            geoIter.reset()
-            
-            #indirect deformation
-            if maxDistance != 0:
-                if bulgeDistanceValue != 0:
-                    if bulgeStrengthValue != 0:
-                        while not geoIter.isDone():
-                            if not geoIter.index() in collidingList:
-                                weightValue = self.weightValue(dataBlock, geoIndex, geoIter.index())
-                                if weightValue == 0:
-                                    geoIter.next()
-                                else:
-                                    point = geoIter.position() * matrix
-                                    colMeshFN.getClosestPoint(point, closePoint, space, None)
-                                    distance = point.distanceTo(closePoint)
-                                    if distance < bulgeDistanceValue:
-                                        normal = om.MVector(normals[geoIter.index()][0],
-                                                            normals[geoIter.index()][1],
-                                                            normals[geoIter.index()][2])
-                                        normalizedDistance = float(distance/bulgeDistanceValue)
-                                        reversedNormalize = (1 - normalizedDistance) / (1 - 0)
-                                        bulgeHandle.getValueAtPosition(normalizedDistance, bulgeValue)
-                                        bulgeResult = bulgeResultMUtil.getFloat(bulgeValue)
-                                        endPoint = point + normal * maxDistance * reversedNormalize * bulgeResult * bulgeStrengthValue * weightValue * envelopeValue 
-                                        endPoint *= matrix.inverse()
-                                        endPointList.set(endPoint, geoIter.index())
-                                        collidingList.append(geoIter.index())
-                                    else:
-                                        endPointList.set(geoIter.position(), geoIter.index())
-                                        
-                            geoIter.next()
-                
-            geoIter.reset()
-        
-            geoIter.setAllPositions(endPointList)
+                        #the collider's BVH is rebuilt only when its topology changes
+                        key = (colIdentity, "mesh", colSignature)
+                        collider = shared_cache.get(key)
+                        if collider is None:
+                            colTriangles = core.triangulate(*colTopology)
+                            collider = shared_cache.put(key, core.MeshCollider(colPoints, colTriangles,
+                                                                               boundingBoxMinValue, boundingBoxMaxValue))
+                        else:
+                            collider.update(colPoints, boundingBoxMinValue, boundingBoxMaxValue)
+                colliders.append(collider)
+                colliderConfiguration.append((colliderIndexList[col], colIdentity, colSignature,
+                                              colMatrix is not None, proxyError))
 
-        #post deformation smoothing
-        if smoothValue == 0:
-            return
+            #analytic colliders are cheap enough to be made again every evaluation
+            colliders.extend(read_primitives(primitiveListHandle))
+
+        #bulge ramp lookup table, resampled only when the ramp entries change
+        self.bulgeTable.update(ramp_entries(bulgeHandle), ramp_sampler(bulgeHandle), bulgeToleranceValue)
+
+        #deformation, the incremental evaluator keeps the last frame's queries
+        if incrementalValue:
+            evaluator = self.incrementalCache.setdefault(geoIndex, IncrementalDeformer())
+            evaluator.threshold = incrementalThresholdValue
+            deformer = evaluator.deform
+        else:
+            self.incrementalCache.pop(geoIndex, None)
+            deformer = core.deform
+        result = deformer(points, normals, weights, colliders, envelopeValue,
+                          bulgeDistanceValue, bulgeStrengthValue, self.bulgeTable,
+                          smoothValue, adjacency, activeIds, workersValue, timer, buffers.result)
+
+        #plastic dents stay after the collider leaves, a jump on the timeline
+        #replays the frames after the nearest checkpoint. The offsets are kept in
+        #object space so the dents move with the mesh's transform
+        inverseMatrix = np.linalg.inv(matrixArray)
+        localPoints = None
+        if elasticityValue == 1:
+            plastic = self.plasticCache.setdefault(geoIndex, PlasticDeformer())
+            settings = (envelopeValue, bulgeDistanceValue, bulgeStrengthValue, self.bulgeTable, smoothValue)
+            history = (envelopeValue, bulgeDistanceValue, bulgeStrengthValue, self.bulgeTable.key, smoothValue,
+                       self.weightGeneration, memberCount, pointLen, exactPushoutValue, tuple(colliderConfiguration),
+                       primitive_configuration(om.MPlug(thisNodeObj, NyCollisionDeformer.primitiveList)))
+            plastic.configure(history,
+                              dataBlock.inputValue(NyCollisionDeformer.startFrame).asFloat(),
+                              dataBlock.inputValue(NyCollisionDeformer.checkpointInterval).asInt(),
+                              int(dataBlock.inputValue(NyCollisionDeformer.checkpointMemoryLimit).asFloat() * 1048576),
+                              dataBlock.inputValue(NyCollisionDeformer.checkpointCompress).asBool())
+            frame = dataBlock.inputValue(NyCollisionDeformer.currentTime).asTime().asUnits(om.MTime.uiUnit())
+            replay = self.replayer(geoIndex, matrixArray, topology, weights, activeIds, settings, workersValue,
+                                   colliderConfiguration, colliders[:len(colliderConfiguration)], exactPushoutValue,
+                                   sdfResolutionValue, sdfMemoryValue)
+            localPoints = outPoints.astype(np.float64)
+            localResult = core.transform_moved(points, result, localPoints.copy(), inverseMatrix)
+            localResult = plastic.deform(frame, localPoints, localResult, replay, localResult)
+        else:
+            self.plasticCache.pop(geoIndex, None)
+
+        #write back
+        with stage(timer, "writeback"):
+            #rows the deformation didn't move keep the input's float32 points bit for bit
+            if localPoints is None:
+                core.transform_moved(points, result, outPoints, inverseMatrix)
+            else:
+                core.transform_moved(localPoints, localResult, outPoints)
+            outMeshFN.updateSurface()
 
-        smoothIterator = om.MItMeshVertex(inputGeom)
-        smoothList = om.MPointArray()
-        smoothList.setLength(pointLen)
-        adjacents = om.MIntArray()
-        adjPoint = om.MPoint()
-        avgUtil = om.MScriptUtil()
-        avgUtil.createFromInt(0)
-        prevIndex = avgUtil.asIntPtr()
-
-        def get_average_point(index):
-            smoothIterator.setIndex(index, prevIndex)
-            smoothIterator.getConnectedVertices(adjacents)
-            avgPoint = om.MPoint()
-            for adj in range(adjacents.length()):
-                defMeshFN.getPoint(adjacents[adj], adjPoint)
-                avgPoint += om.MVector(adjPoint)
-             
-            avgPos = avgPoint / adjacents.length()
-            return avgPos
-
-        for smoothIt in range(smoothValue):
-            while not geoIter.isDone():
-                if geoIter.index() not in collidingList:
-                    smoothList.set(geoIter.position(), geoIter.index())
+        if timer is not None:
+            self.publish_stats(dataBlock, timer, geoIndex, pointLen)
+
+    def replayer(self, geoIndex, matrixArray, topology, weights, activeIds, settings, workers, configuration,
+                 liveColliders, exactPushout, sdfResolution, sdfMemory):
+        #elastic deformation of another frame with the inputs and the mesh's world
+        #matrix evaluated at that frame, in object space like the plastic offsets.
+        #Every collider is replayed as the type it is now: rigid ones share the
+        #current field at the frame's matrix, proxies get their own proxy
+        thisNodeObj = self.thisMObject()
+        inputPlug = om.MPlug(thisNodeObj, ommpx.cvar.MPxGeometryFilter_input).elementByLogicalIndex(geoIndex)
+        inputGeomPlug = inputPlug.child(ommpx.cvar.MPxGeometryFilter_inputGeom)
+        outputGeomPlug = om.MPlug(thisNodeObj, ommpx.cvar.MPxGeometryFilter_outputGeom).elementByLogicalIndex(geoIndex)
+        geoMatrixPlug = world_matrix_plug(outputGeomPlug)
+        colliderListPlug = om.MPlug(thisNodeObj, NyCollisionDeformer.colliderList)
+        colliderMatrixPlug = om.MPlug(thisNodeObj, NyCollisionDeformer.colliderMatrixList)
+        boundingBoxPlug = om.MPlug(thisNodeObj, NyCollisionDeformer.boundingBoxComp)
+        primitiveListPlug = om.MPlug(thisNodeObj, NyCollisionDeformer.primitiveList)
+        signature, faceCounts, faceConnects, adjacency, normalIndices = topology
+        envelope, bulgeDistance, bulgeStrength, bulgeRamp, smoothIterations = settings
+        colliderCache = {}
+
+        def replay(frame):
+            context = om.MDGContext(om.MTime(frame, om.MTime.uiUnit()))
+            meshFN = om.MFnMesh(inputGeomPlug.asMObject(context))
+            #the topology is only read when the counts still match
+            if mesh_counts(meshFN) != signature[:3] or mesh_signature(meshFN) != signature:
+                return None
+            geoMatrix = matrixArray if geoMatrixPlug is None else plug_matrix(geoMatrixPlug, context)
+            localPoints = raw_points(meshFN).astype(np.float64)
+            points = core.transform_points(localPoints, geoMatrix)
+            normals = core.vertex_normals(points, faceCounts, faceConnects, indices=normalIndices)
+
+            colliders = []
+            for entry, live in zip(configuration, liveColliders):
+                index, colIdentity, colSignature, rigid, proxyError = entry
+                colMeshFN = om.MFnMesh(colliderListPlug.elementByLogicalIndex(index).asMObject(context))
+                box = boundingBoxPlug.elementByLogicalIndex(index)
+                colMin = plug_float3(box.child(NyCollisionDeformer.boundingBoxMin), context)
+                colMax = plug_float3(box.child(NyCollisionDeformer.boundingBoxMax), context)
+                colTopology = mesh_topology(colMeshFN)
+                frameSignature = mesh_signature(colMeshFN, colTopology)
+                colPoints = raw_points(colMeshFN)
+                cached = colliderCache.get(index)
+                if cached is not None and cached[0] != frameSignature:
+                    cached = None
+                if rigid:
+                    #the field is only built again when the collider's shape differs from the current one
+                    colMatrix = plug_matrix(colliderMatrixPlug.elementByLogicalIndex(index), context)
+                    field = cached[1] if cached is not None else (live if frameSignature == colSignature else None)
+                    if field is None or not field.matches(colPoints, colMatrix):
+                        localColPoints = core.transform_points(colPoints, np.linalg.inv(colMatrix))
+                        field = RigidCollider(localColPoints, core.triangulate(*colTopology), colMatrix, bulgeDistance,
+                                              sdfResolution, sdfMemory)
+                        colliderCache[index] = (frameSignature, field)
+                    colliders.append(field.moved(colMatrix, colMin, colMax))
+                elif cached is None:
+                    colTriangles = core.triangulate(*colTopology)
+                    if proxyError > 0:
+                        collider = ProxyCollider(colPoints, colTriangles, proxyError, exactPushout, colMin, colMax)
+                    else:
+                        collider = core.MeshCollider(colPoints, colTriangles, colMin, colMax)
+                    colliderCache[index] = (frameSignature, collider)
+                    colliders.append(collider)
                 else:
-                    point = geoIter.position()
-                    averagePoint = get_average_point(geoIter.index())
-                    offset = point - averagePoint
-                    endPoint = point - offset * 0.5 * envelopeValue
-                    smoothList.set(endPoint, geoIter.index())
-      
-                geoIter.next()
-            
-            geoIter.reset()
+                    cached[1].update(colPoints, colMin, colMax)
+                    colliders.append(cached[1])
+            colliders.extend(plug_primitives(primitiveListPlug, context))
+
+            result = core.deform(points, normals, weights, colliders, envelope, bulgeDistance, bulgeStrength,
+                                 bulgeRamp, smoothIterations, adjacency, activeIds, workers)
+            return localPoints, core.transform_moved(points, result, localPoints.copy(), np.linalg.inv(geoMatrix))
+        return replay
+
+    def publish_stats(self, dataBlock, timer, geoIndex, pointCount):
+        #the outputs hold the last evaluation, the rolling log keeps every one
+        times = om.MDoubleArray()
+        for name in STAGES:
+            times.append(timer.times[name])
+        counts = om.MIntArray()
+        for name in COUNTS:
+            counts.append(timer.counts[name])
+        for attribute, data in ((NyCollisionDeformer.profileTimes, om.MFnDoubleArrayData().create(times)),
+                                (NyCollisionDeformer.profileCounts, om.MFnIntArrayData().create(counts))):
+            handle = dataBlock.outputValue(attribute)
+            handle.setMObject(data)
+            handle.setClean()
+
+        logPath = dataBlock.inputValue(NyCollisionDeformer.profileLog).asString()
+        if self.profileLog is not None and self.profileLog.path != logPath:
+            self.profileLog.close()
+            self.profileLog = None
+        if logPath and self.profileLog is None:
+            self.profileLog = StageLog(logPath)
+        if self.profileLog is not None:
+            self.profileLog.write(timer, node=om.MFnDependencyNode(self.thisMObject()).name(),
+                                  geometry=geoIndex, vertices=pointCount)
+
+
+def raw_points(meshFN):
+    #float32 view on the mesh's own point buffer, no copy
+    count = meshFN.numVertices()
+    if count == 0:
+        return np.zeros((0, 3), dtype=np.float32)
+    address = int(meshFN.getRawPoints())
+    buffer = (ctypes.c_float * (count * 3)).from_address(address)
+    return np.ctypeslib.as_array(buffer).reshape(count, 3)
+
+def read_weights(dataBlock, geoIndex, count, dtype=np.float64):
+    #unset weights default to 1, only the stored elements are visited
+    weights = np.ones(count, dtype=dtype)
+    weightListHandle = dataBlock.inputArrayValue(ommpx.cvar.MPxDeformerNode_weightList)
+    try:
+        weightListHandle.jumpToElement(geoIndex)
+    except RuntimeError:
+        return weights
+    weightsHandle = om.MArrayDataHandle(weightListHandle.inputValue().child(ommpx.cvar.MPxDeformerNode_weights))
+    for i in range(weightsHandle.elementCount()):
+        weightsHandle.jumpToArrayElement(i)
+        index = weightsHandle.elementIndex()
+        if index < count:
+            weights[index] = weightsHandle.inputValue().asFloat()
+    return weights
+
+def member_ids(geoIter):
+    #vertex ids of the deformer set, the iterator only visits its members
+    ids = []
+    geoIter.reset()
+    while not geoIter.isDone():
+        ids.append(geoIter.index())
+        geoIter.next()
+    return np.unique(np.array(ids, dtype=np.int64))
+
+def source_identity(plug):
+    #hash of the node feeding the plug, None when nothing is connected
+    sources = om.MPlugArray()
+    plug.connectedTo(sources, True, False)
+    if sources.length() == 0:
+        return None
+    return om.MObjectHandle(sources[0].node()).hashCode()
+
+def array_element(arrayHandle, index, default, getter):
+    #value of a logical element of an array attribute, default if it doesn't exist
+    try:
+        arrayHandle.jumpToElement(index)
+    except RuntimeError:
+        return default
+    return getattr(arrayHandle.inputValue(), getter)()
 
-            geoIter.setAllPositions(smoothList)
+def read_primitives(primitiveListHandle):
+    primitives = []
+    for i in range(primitiveListHandle.elementCount()):
+        primitiveListHandle.jumpToArrayElement(i)
+        element = primitiveListHandle.inputValue()
+        size = element.child(NyCollisionDeformer.primitiveSize).asFloat3()
+        primitives.append(primitive_collider(element.child(NyCollisionDeformer.primitiveType).asShort(),
+                                             matrix_to_numpy(element.child(NyCollisionDeformer.primitiveMatrix).asMatrix()),
+                                             element.child(NyCollisionDeformer.primitiveRadius).asFloat(),
+                                             element.child(NyCollisionDeformer.primitiveHeight).asFloat(),
+                                             [size[0], size[1], size[2]]))
+    return primitives
 
+def plug_float3(plug, context):
+    return [plug.child(axis).asFloat(context) for axis in range(3)]
+
+def plug_matrix(plug, context):
+    return matrix_to_numpy(om.MFnMatrixData(plug.asMObject(context)).matrix())
+
+def world_matrix_plug(outputGeomPlug):
+    #worldMatrix of the mesh shape the output geometry flows into, None when there is none
+    iterator = om.MItDependencyGraph(outputGeomPlug, om.MFn.kMesh, om.MItDependencyGraph.kDownstream,
+                                     om.MItDependencyGraph.kDepthFirst, om.MItDependencyGraph.kPlugLevel)
+    if iterator.isDone():
+        return None
+    shape = iterator.currentItem()
+    dagPath = om.MDagPath()
+    om.MDagPath.getAPathTo(shape, dagPath)
+    return om.MFnDependencyNode(shape).findPlug("worldMatrix", False).elementByLogicalIndex(dagPath.instanceNumber())
+
+def plug_primitives(primitiveListPlug, context):
+    #read_primitives for another frame, through plugs instead of the data block
+    primitives = []
+    for i in range(primitiveListPlug.numElements()):
+        element = primitiveListPlug.elementByPhysicalIndex(i)
+        primitives.append(primitive_collider(element.child(NyCollisionDeformer.primitiveType).asShort(context),
+                                             plug_matrix(element.child(NyCollisionDeformer.primitiveMatrix), context),
+                                             element.child(NyCollisionDeformer.primitiveRadius).asFloat(context),
+                                             element.child(NyCollisionDeformer.primitiveHeight).asFloat(context),
+                                             plug_float3(element.child(NyCollisionDeformer.primitiveSize), context)))
+    return primitives
+
+def primitive_configuration(primitiveListPlug):
+    #type and undriven parameters of every analytic collider, driven ones are
+    #read again for every replayed frame
+    configuration = []
+    for i in range(primitiveListPlug.numElements()):
+        element = primitiveListPlug.elementByPhysicalIndex(i)
+        entry = [element.logicalIndex(), element.child(NyCollisionDeformer.primitiveType).asShort()]
+        for attribute in (NyCollisionDeformer.primitiveRadius, NyCollisionDeformer.primitiveHeight):
+            plug = element.child(attribute)
+            entry.append(None if plug.isConnected() else plug.asFloat())
+        plug = element.child(NyCollisionDeformer.primitiveSize)
+        driven = plug.isConnected() or any(plug.child(axis).isConnected() for axis in range(3))
+        entry.append(None if driven else tuple(plug_float3(plug, om.MDGContext.fsNormal)))
+        configuration.append(tuple(entry))
+    return tuple(configuration)
+
+def int_array(mIntArray):
+    #copied in one go through MScriptUtil, indexing the MIntArray would be a
+    #python call for every face vertex
+    count = mIntArray.length()
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    util = om.MScriptUtil(mIntArray)
+    buffer = (ctypes.c_int * count).from_address(int(util.asIntPtr()))
+    return np.ctypeslib.as_array(buffer).astype(np.int64)
+
+def mesh_counts(meshFN):
+    #vertex, face and face vertex counts, nothing is copied
+    return meshFN.numVertices(), meshFN.numPolygons(), meshFN.numFaceVertices()
+
+def mesh_signature(meshFN, topology=None):
+    #element counts and a hash of the face vertex ids, an edge flip or spin keeps the counts
+    faceCounts, faceConnects = mesh_topology(meshFN) if topology is None else topology
+    return (meshFN.numVertices(), len(faceCounts), len(faceConnects),
+            zlib.crc32(faceConnects.tobytes(), zlib.crc32(faceCounts.tobytes())))
+
+def mesh_topology(meshFN):
+    faceCounts = om.MIntArray()
+    faceConnects = om.MIntArray()
+    meshFN.getVertices(faceCounts, faceConnects)
+    return int_array(faceCounts), int_array(faceConnects)
+
+def matrix_to_numpy(matrix):
+    return np.array([[matrix(row, column) for column in range(4)] for row in range(4)])
+
+def ramp_entries(rampHandle):
+    indexes = om.MIntArray()
+    positions = om.MFloatArray()
+    values = om.MFloatArray()
+    interps = om.MIntArray()
+    rampHandle.getEntries(indexes, positions, values, interps)
+    return tuple(sorted((positions[i], values[i], interps[i]) for i in range(indexes.length())))
+
+def ramp_sampler(bulgeHandle):
+    bulgeMUtil = om.MScriptUtil()
+    bulgeValue = bulgeMUtil.asFloatPtr()
+
+    def sample(positions):
+        values = np.empty(len(positions))
+        for i in range(len(positions)):
+            bulgeHandle.getValueAtPosition(float(positions[i]), bulgeValue)
+            values[i] = om.MScriptUtil.getFloat(bulgeValue)
+        return values
+    return sample
 
       
 def initializePlugin(plugin):
     vendor = "Nazmi 'printer' Yazici"
     version = "0.9.0"
     pluginFN = ommpx.MFnPlugin(plugin, vendor, version)
+    if cmds.optionVar(exists=CACHE_MEMORY_OPTION):
+        shared_cache.resize(int(cmds.optionVar(query=CACHE_MEMORY_OPTION) * 1048576))
     cmds.makePaintable(NyCollisionDeformer.NODE_NAME, "weights", attrType="multiFloat", shapeMode="deformer")
     try:
         pluginFN.registerNode(NyCollisionDeformer.NODE_NAME,
@@ -382,13 +886,30 @@ global proc AEnyCollisionDeformerTemplate( string $NODE_NAME )
         editorTemplate -addSeparator;
         editorTemplate -addSeparator;
         editorTemplate -addSeparator;
-        //editorTemplate -addControl "elasticity";
+        editorTemplate -addControl "elasticity";
+        editorTemplate -addControl "startFrame";
+        editorTemplate -addControl "checkpointInterval";
+        editorTemplate -addControl "checkpointMemoryLimit";
+        editorTemplate -addControl "checkpointCompress";
         editorTemplate -addControl "smoothIterations";
+        editorTemplate -addSeparator;
+        editorTemplate -addControl "incremental";
+        editorTemplate -addControl "incrementalThreshold";
+        editorTemplate -addControl "workers";
+        editorTemplate -addControl "precision";
+        editorTemplate -addSeparator;
+        editorTemplate -addControl "profile";
+        editorTemplate -addControl "profileLog";
+        editorTemplate -addSeparator;
+        editorTemplate -addControl "exactPushout";
+        editorTemplate -addControl "sdfResolution";
+        editorTemplate -addControl "sdfMemoryLimit";
         editorTemplate -endLayout;
 
         editorTemplate -beginLayout "Bulge Settings" -collapse 0;
         editorTemplate -addControl "bulgeDistance";
         editorTemplate -addControl "bulgeStrength";    
+        editorTemplate -addControl "bulgeRampTolerance";
         AEaddRampControl( $NODE_NAME + ".bulgeRamp" );
         AEdependNodeTemplate $NODE_NAME;
         editorTemplate -endLayout;
@@ -410,8 +931,10 @@ global proc nyCollision_create()
 		string $deformer[] = `deformer -typ "nyCollisionDeformer" $deforming`;
         
 		connectAttr -f ($colliderShape[0] + ".worldMesh[0]") ($deformer[0] + ".colliderList[0]");
+		connectAttr -f ($collider + ".worldMatrix[0]") ($deformer[0] + ".colliderMatrixList[0]");
 		connectAttr -f ($collider + ".boundingBoxMin") ($deformer[0] + ".boundingBoxList[0].boundingBoxMin");
         connectAttr -f ($collider + ".boundingBoxMax") ($deformer[0] + ".boundingBoxList[0].boundingBoxMax");
+        connectAttr -f "time1.outTime" ($deformer[0] + ".currentTime");
 	}
 	else
 	{
@@ -438,6 +961,7 @@ global proc nyCollision_add()
         int $finalIndex = $lastItem + 1;
         
 		connectAttr ($colliderShape[0] + ".worldMesh[0]") ($deformerNode[0] + ".colliderList[" + $finalIndex + "]");
+		connectAttr ($collider + ".worldMatrix[0]") ($deformerNode[0] + ".colliderMatrixList[" + $finalIndex + "]");
 		connectAttr ($collider + ".boundingBoxMin") ($deformerNode[0] + ".boundingBoxList[" + $finalIndex + "].boundingBoxMin");
         connectAttr ($collider + ".boundingBoxMax") ($deformerNode[0] + ".boundingBoxList[" + $finalIndex + "].boundingBoxMax");
 	}
@@ -461,15 +985,95 @@ global proc nyCollision_remove()
         string $colliderMinConn[] = `listConnections -p true -d true -s false ($collider + ".boundingBoxMin")`;
         string $colliderMaxConn[] = `listConnections -p true -d true -s false ($collider + ".boundingBoxMax")`;
         string $colliderShapeConn[] = `listConnections -p true -d true -s false ($colliderShape[0] + ".worldMesh[0]")`;
+        string $colliderMatrixConn[] = `listConnections -p true -d true -s false ($collider + ".worldMatrix[0]")`;
         
 		disconnectAttr ($colliderShape[0] + ".worldMesh[0]") ($colliderShapeConn);
 		disconnectAttr ($collider + ".boundingBoxMin") ($colliderMinConn);
         disconnectAttr ($collider + ".boundingBoxMax") ($colliderMaxConn);
+        if (size($colliderMatrixConn))
+            disconnectAttr ($collider + ".worldMatrix[0]") ($colliderMatrixConn);
 	}
 	else
 	{
 		error "Please select collider, then deforming object only to remove collider.";
 	}
 }
+
+//budget of the collider cache every node shares, in megabytes and kept between sessions
+global proc nyCollision_cacheMemory(float $megabytes)
+{
+    optionVar -floatValue "nyCollisionCacheMemory" $megabytes;
+    python ("from ny_collision.cache import shared_cache; shared_cache.resize(int(" + $megabytes + " * 1048576))");
+}
+
+//adding an analytic collider (sphere, capsule, box or plane) driven by a transform
+global proc nyCollision_addPrimitive(string $type)
+{
+	string $types[] = {"sphere", "capsule", "box", "plane"};
+	int $typeIndex = stringArrayFind($type, 0, $types);
+	if ($typeIndex < 0)
+		error ("Unknown primitive type: " + $type);
+
+	string $selList[] = `ls -sl -ap -long`;
+	if (size($selList)==2)
+	{
+		string $primitive = $selList[0];
+		string $deforming = $selList[1];
+        
+		string $deformingShape[] = `listRelatives -s -children $deforming`;
+        string $deformerNode[] = `listConnections -d false -s true ($deformingShape[0] + ".inMesh")`;
+        int $multiIndex[] = `getAttr -mi ($deformerNode[0] + ".primitiveList")`;
+        int $finalIndex = 0;
+        if (size($multiIndex))
+            $finalIndex = $multiIndex[size($multiIndex) - 1] + 1;
+        
+		connectAttr ($primitive + ".worldMatrix[0]") ($deformerNode[0] + ".primitiveList[" + $finalIndex + "].primitiveMatrix");
+		setAttr ($deformerNode[0] + ".primitiveList[" + $finalIndex + "].primitiveType") $typeIndex;
+	}
+	else
+	{
+		error "Please select primitive transform, then deforming object only to add a primitive collider.";
+	}
+}
+
+//removing an analytic collider from the deformer
+global proc nyCollision_removePrimitive()
+{
+	string $selList[] = `ls -sl -ap -long`;
+	if (size($selList)==2)
+	{
+		string $primitive = $selList[0];
+        
+        string $primitiveConn[] = `listConnections -p true -d true -s false ($primitive + ".worldMatrix[0]")`;
+        for ($conn in $primitiveConn)
+        {
+            if (`gmatch $conn "*.primitiveList*"`)
+            {
+                disconnectAttr ($primitive + ".worldMatrix[0]") $conn;
+                removeMultiInstance -b true (plugNode($conn) + "." + `match "primitiveList\\\\[[0-9]+\\\\]" $conn`);
+            }
+        }
+	}
+	else
+	{
+		error "Please select primitive transform, then deforming object only to remove a primitive collider.";
+	}
+}
 '''
+
+#stage names come from the timing module
+mel += '''
+//printing the profile of the last evaluation, the profile attribute has to be on
+global proc nyCollision_stats(string $node)
+{
+    string $stages[] = {%s};
+    string $counts[] = {%s};
+    float $times[] = `getAttr ($node + ".profileTimes")`;
+    int $values[] = `getAttr ($node + ".profileCounts")`;
+    for ($i = 0; $i < size($times); $i++)
+        print ($stages[$i] + ": " + $times[$i] + "s\\n");
+    for ($i = 0; $i < size($values); $i++)
+        print ($counts[$i] + ": " + $values[$i] + "\\n");
+}
+''' % (", ".join('"{}"'.format(name) for name in STAGES), ", ".join('"{}"'.format(name) for name in COUNTS))
 meval(mel)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from ny_collision import bake, core
+from ny_collision.benchmark import grid_mesh, sphere_mesh
+from ny_collision.ramp import RampTable, ramp_curve
+
+
+def write_obj(path, points, faceCounts, faceConnects):
+    with open(str(path), "w") as objFile:
+        for point in points:
+            objFile.write("v {} {} {}\n".format(*point))
+        start = 0
+        for count in faceCounts:
+            objFile.write("f {}\n".format(" ".join(str(index + 1) for index in faceConnects[start:start + count])))
+            start += count
+
+
+def collider_points(frame):
+    #a sphere sinking into the grid a little more every frame
+    points = sphere_mesh(600, 0.5)[0]
+    return points + [0.0, 0.0, 0.6 - 0.1 * frame]
+
+
+@pytest.fixture
+def scene(tmp_path):
+    points, faceCounts, faceConnects = grid_mesh(900)
+    write_obj(tmp_path / "grid.obj", points, faceCounts, faceConnects)
+    sphereCounts, sphereConnects = sphere_mesh(600, 0.5)[1:]
+    for frame in (1, 2, 3):
+        write_obj(tmp_path / "sphere.{:04d}.obj".format(frame), collider_points(frame), sphereCounts, sphereConnects)
+    return tmp_path
+
+
+def run(scene, *options):
+    output = str(scene / "baked.npy")
+    bake.main([str(scene / "grid.obj"), "-c", str(scene / "sphere.####.obj"), "-o", output, "-f", "1", "3",
+               "-q", "--processes", "1", "--precision", "float64", "--bulge-distance", "0.4"] + list(options))
+    return np.load(output)
+
+
+def expected(scene, entries):
+    #every frame deformed like the node with a bulge ramp of these entries
+    points, faceCounts, faceConnects = bake.read_obj(str(scene / "grid.obj"))
+    normals = core.vertex_normals(points, faceCounts, faceConnects)
+    triangles = core.triangulate(*sphere_mesh(600, 0.5)[1:])
+    table = RampTable()
+    table.update(tuple(entries), ramp_curve(entries))
+    frames = []
+    for frame in (1, 2, 3):
+        collider = core.MeshCollider(collider_points(frame), triangles)
+        frames.append(core.deform(points, normals, np.ones(len(points)), [collider], 1.0, 0.4, 1.0, table))
+    return np.array(frames, dtype=np.float32)
+
+
+def test_read_obj_and_frame_paths(scene):
+    points, faceCounts, faceConnects = grid_mesh(900)
+    read = bake.read_obj(str(scene / "grid.obj"))
+    assert np.allclose(read[0], points)
+    assert np.array_equal(read[1], faceCounts) and np.array_equal(read[2], faceConnects)
+    assert bake.frame_path("sphere.####.obj", 12) == "sphere.0012.obj"
+    assert bake.frame_path("sphere.#.obj", 120) == "sphere.120.obj"
+
+
+def test_bakes_with_the_nodes_default_ramp(scene):
+    baked = run(scene)
+    assert baked.shape == (3, 900, 3)
+    assert np.allclose(baked, expected(scene, bake.BULGE_RAMP), rtol=0.0, atol=1e-6)
+
+
+def test_bakes_with_ramp_entries_from_the_command_line(scene):
+    entries = [(0.0, 0.0, "linear"), (0.5, 1.0, "smooth"), (1.0, 0.0, "linear")]
+    options = []
+    for entry in entries:
+        options += ["--bulge-ramp"] + [str(field) for field in entry]
+    baked = run(scene, *options)
+    assert np.allclose(baked, expected(scene, entries), rtol=0.0, atol=1e-6)
+    assert not np.allclose(baked, expected(scene, bake.BULGE_RAMP), rtol=0.0, atol=1e-6)
+
+
+def test_unknown_ramp_interpolations_are_refused(scene):
+    with pytest.raises(SystemExit):
+        run(scene, "--bulge-ramp", "0", "1", "cubic")
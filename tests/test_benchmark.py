@@ -0,0 +1,53 @@
+import json
+
+from ny_collision import benchmark
+from ny_collision.timing import STAGES
+
+ARGS = ["--filter", "grid-1000v", "--repeats", "1", "-q"]
+
+
+def report(seconds):
+    return {"results": [{"name": "scenario", "stages": dict((name, seconds) for name in STAGES)}]}
+
+
+def test_regressions_need_both_the_tolerance_and_the_seconds():
+    baseline = report(0.1)
+    assert benchmark.regressions(report(0.11), baseline) == []
+    assert benchmark.regressions(report(0.101), baseline, tolerance=0.0) == []
+    slower = benchmark.regressions(report(0.2), baseline)
+    assert [(name, stage) for name, stage, before, current in slower] == [("scenario", stage) for stage in STAGES]
+
+
+def test_unknown_scenarios_are_not_compared():
+    current = report(1.0)
+    current["results"][0]["name"] = "other"
+    assert benchmark.regressions(current, report(0.1)) == []
+
+
+def test_baseline_round_trip(tmp_path):
+    baselinePath = str(tmp_path / "baseline.json")
+    assert benchmark.main(ARGS + ["-o", str(tmp_path / "first.json"), "--save-baseline", baselinePath]) == 0
+    with open(baselinePath) as baselineFile:
+        baseline = json.load(baselineFile)
+    assert [result["name"] for result in baseline["results"]] == ["grid-1000v-1c-10p-b0.1-s1"]
+    assert set(baseline["results"][0]["stages"]) == set(STAGES)
+
+    #a much slower baseline passes
+    for result in baseline["results"]:
+        result["stages"] = dict((name, seconds * 10 + 1.0) for name, seconds in result["stages"].items())
+    with open(baselinePath, "w") as baselineFile:
+        json.dump(baseline, baselineFile)
+    assert benchmark.main(ARGS + ["-o", str(tmp_path / "second.json"), "--baseline", baselinePath]) == 0
+
+
+def test_a_slower_run_fails_the_gate(tmp_path):
+    baselinePath = str(tmp_path / "baseline.json")
+    benchmark.main(ARGS + ["-o", baselinePath])
+    with open(baselinePath) as baselineFile:
+        baseline = json.load(baselineFile)
+    #a baseline a second faster than instant makes every stage a regression
+    for result in baseline["results"]:
+        result["stages"] = dict((name, -1.0) for name in result["stages"])
+    with open(baselinePath, "w") as baselineFile:
+        json.dump(baseline, baselineFile)
+    assert benchmark.main(ARGS + ["-o", str(tmp_path / "current.json"), "--baseline", baselinePath]) == 1
@@ -0,0 +1,59 @@
+import numpy as np
+
+from ny_collision.broadphase import BoxTree
+
+
+def boxes(count=40):
+    rng = np.random.RandomState(0)
+    boxMin = rng.uniform(-5.0, 5.0, (count, 3))
+    return boxMin, boxMin + rng.uniform(0.1, 2.0, (count, 3))
+
+
+def points(count=5000):
+    return np.random.RandomState(1).uniform(-6.0, 8.0, (count, 3))
+
+
+def brute_force_pairs(points, boxMin, boxMax, margin=0.0):
+    inside = ((points[:, None] >= boxMin - margin) & (points[:, None] <= boxMax + margin)).all(axis=-1)
+    return set(zip(*np.nonzero(inside)))
+
+
+def pairs(pairIds, pairBoxes):
+    return set(zip(pairIds, pairBoxes))
+
+
+def test_overlaps_match_a_brute_force_test():
+    boxMin, boxMax = boxes()
+    samples = points()
+    result = BoxTree(boxMin, boxMax).overlaps(samples)
+    assert len(result[0]) == len(pairs(*result))
+    assert pairs(*result) == brute_force_pairs(samples, boxMin, boxMax)
+
+
+def test_the_margin_grows_every_box():
+    boxMin, boxMax = boxes()
+    samples = points()
+    result = BoxTree(boxMin, boxMax).overlaps(samples, 0.5)
+    assert pairs(*result) == brute_force_pairs(samples, boxMin, boxMax, 0.5)
+
+
+def test_the_result_can_be_limited_to_some_boxes():
+    boxMin, boxMax = boxes()
+    samples = points()
+    result = BoxTree(boxMin, boxMax).overlaps(samples, boxes=[3, 7])
+    expected = set(pair for pair in brute_force_pairs(samples, boxMin, boxMax) if pair[1] in (3, 7))
+    assert pairs(*result) == expected
+
+
+def test_unbounded_boxes_are_routed_like_the_others():
+    #the half space below a plane next to two finite boxes
+    boxMin = [[-np.inf, -np.inf, -np.inf], [0.0, 0.0, 0.0], [2.0, 2.0, 2.0]]
+    boxMax = [[np.inf, 0.5, np.inf], [1.0, 1.0, 1.0], [3.0, 3.0, 3.0]]
+    samples = points()
+    result = BoxTree(boxMin, boxMax).overlaps(samples)
+    assert pairs(*result) == brute_force_pairs(samples, np.array(boxMin), np.array(boxMax))
+
+
+def test_an_empty_tree_has_no_overlaps():
+    pairIds, pairBoxes = BoxTree(np.zeros((0, 3)), np.zeros((0, 3))).overlaps(points(10))
+    assert len(pairIds) == 0 and len(pairBoxes) == 0
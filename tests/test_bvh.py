@@ -0,0 +1,70 @@
+import numpy as np
+
+from ny_collision import core
+from ny_collision.benchmark import sphere_mesh
+from ny_collision.bvh import BVH
+from ny_collision.geometry import closest_point_on_triangles, ray_triangle_params
+
+
+def sphere_bvh():
+    points, faceCounts, faceConnects = sphere_mesh(1200)
+    points = points * [1.0, 0.7, 1.3]
+    return BVH(core.triangulate(faceCounts, faceConnects), points)
+
+
+def rays(count=1000):
+    #origins inside and outside the sphere, pointing anywhere
+    rng = np.random.RandomState(0)
+    origins = rng.uniform(-2.0, 2.0, (count, 3))
+    directions = rng.normal(size=(count, 3))
+    return origins, directions / np.sqrt((directions * directions).sum(axis=1))[:, None]
+
+
+def brute_force_hits(bvh, origins, directions, maxParam):
+    a, b, c = bvh.corners
+    params = ray_triangle_params(origins[:, None], directions[:, None], a, b, c)
+    params[params >= maxParam] = np.inf
+    return params.min(axis=1), params
+
+
+def test_ray_hits_match_a_brute_force_test():
+    bvh = sphere_bvh()
+    origins, directions = rays()
+    params, faces = bvh.ray_hits(origins, directions, 100.0)
+    expected, everyParam = brute_force_hits(bvh, origins, directions, 100.0)
+    assert np.isinf(expected).any() and np.isfinite(expected).any()
+    assert np.array_equal(np.isinf(params), np.isinf(expected))
+    hit = np.flatnonzero(np.isfinite(expected))
+    assert np.array_equal(params[hit], expected[hit])
+    #ties between triangles sharing an edge may pick either of them
+    assert np.array_equal(everyParam[hit, faces[hit]], expected[hit])
+    assert (faces[np.isinf(expected)] == -1).all()
+
+
+def test_ray_hits_stop_at_the_max_param():
+    bvh = sphere_bvh()
+    origins, directions = rays()
+    params, faces = bvh.ray_hits(origins, directions, 0.5)
+    expected = brute_force_hits(bvh, origins, directions, 0.5)[0]
+    assert np.array_equal(np.isinf(params), np.isinf(expected))
+    assert (params[np.isfinite(params)] < 0.5).all()
+
+
+def test_closest_points_match_a_brute_force_search():
+    bvh = sphere_bvh()
+    points = rays()[0]
+    closest, faces, distance = bvh.closest_point(points)
+    a, b, c = bvh.corners
+    candidates = closest_point_on_triangles(points[:, None], a, b, c)
+    expected = ((candidates - points[:, None]) ** 2).sum(axis=-1).min(axis=1)
+    assert np.allclose(distance, expected, rtol=0.0, atol=1e-12)
+    assert np.allclose(((closest - points) ** 2).sum(axis=1), expected, rtol=0.0, atol=1e-12)
+
+
+def test_refit_follows_the_points():
+    bvh = sphere_bvh()
+    points = rays(500)[0]
+    moved = bvh.points * 1.5 + [0.2, -0.1, 0.3]
+    bvh.refit(moved)
+    fresh = BVH(bvh.triangles, moved)
+    assert np.array_equal(bvh.closest_point(points)[2], fresh.closest_point(points)[2])
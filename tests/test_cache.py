@@ -0,0 +1,35 @@
+import numpy as np
+
+from ny_collision.cache import ColliderCache
+
+
+class Entry(object):
+    def __init__(self, size):
+        self.data = np.zeros(size, dtype=np.uint8)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ColliderCache(maxBytes=300)
+    for key in "abc":
+        cache.put(key, Entry(100))
+    cache.get("a")
+    cache.put("d", Entry(100))
+    assert sorted(cache.entries) == ["a", "c", "d"]
+    assert cache.nbytes == 300
+
+
+def test_grown_entries_are_measured_again():
+    cache = ColliderCache(maxBytes=300)
+    cache.put("a", Entry(100))
+    grown = cache.put("b", Entry(100))
+    grown.extra = np.zeros(150, dtype=np.uint8)
+    cache.remeasure("b")
+    assert sorted(cache.entries) == ["b"]
+    assert cache.nbytes == 250
+
+
+def test_invalid_entries_are_dropped():
+    cache = ColliderCache()
+    cache.put("a", Entry(10))
+    assert cache.get("a", lambda entry: len(entry.data) > 10) is None
+    assert len(cache) == 0
@@ -0,0 +1,143 @@
+import numpy as np
+
+from ny_collision import core
+from ny_collision.benchmark import build_scenario, grid_mesh, sphere_mesh
+from ny_collision.buffers import DeformBuffers
+
+
+def rotated_matrix():
+    angle = np.radians(37.0)
+    matrix = np.eye(4)
+    matrix[:3, :3] = np.array([[np.cos(angle), np.sin(angle), 0.0],
+                               [-np.sin(angle), np.cos(angle), 0.0],
+                               [0.0, 0.0, 1.0]]) * 1.3
+    matrix[3, :3] = (12.5, -3.25, 7.1)
+    return matrix
+
+
+def test_transform_points_into_float64_matches_the_allocating_path():
+    points = (np.random.RandomState(0).rand(5000, 3) * 20 - 10).astype(np.float32)
+    out = np.empty((len(points), 3))
+    core.transform_points(points, rotated_matrix(), out)
+    assert np.array_equal(out, core.transform_points(points, rotated_matrix()))
+
+
+def test_transform_points_round_trip_into_float32():
+    points = (np.random.RandomState(0).rand(5000, 3) * 20 - 10).astype(np.float32)
+    world = core.transform_points(points, rotated_matrix())
+    back = np.empty_like(points)
+    core.transform_points(world, np.linalg.inv(rotated_matrix()), back)
+    assert np.abs(back - points).max() < 1e-5
+
+
+
+def test_only_moved_rows_are_written_back():
+    #far from the origin a float32 round trip through the matrix changes the points
+    matrix = rotated_matrix()
+    matrix[3, :3] = (500.0, 20.0, -300.0)
+    local = (np.random.RandomState(0).rand(5000, 3) * 20 - 10).astype(np.float32)
+    points = core.transform_points(local, matrix, np.empty(local.shape, dtype=np.float32))
+    result = points.copy()
+    result[::7] += 0.25
+    out = local.copy()
+    core.transform_moved(points, result, out, np.linalg.inv(matrix))
+    moved = np.zeros(len(points), dtype=bool)
+    moved[::7] = True
+    assert np.array_equal(out[~moved], local[~moved])
+    expected = core.transform_points(result[moved].astype(np.float64), np.linalg.inv(matrix)).astype(np.float32)
+    assert np.array_equal(out[moved], expected)
+    roundTrip = core.transform_points(result, np.linalg.inv(matrix), np.empty_like(local))
+    assert not np.array_equal(roundTrip[~moved], local[~moved])
+
+def test_vertex_normals_of_a_sphere_point_outwards():
+    points, faceCounts, faceConnects = sphere_mesh(2000)
+    normals = core.vertex_normals(points, faceCounts, faceConnects)
+    assert np.allclose(np.sqrt((normals * normals).sum(axis=1)), 1.0)
+    assert ((normals * points).sum(axis=1) > 0.99).all()
+
+
+def test_vertex_normals_with_cached_indices_and_out():
+    points, faceCounts, faceConnects = grid_mesh(900)
+    out = np.empty((len(points), 3))
+    result = core.vertex_normals(points, faceCounts, faceConnects, out, core.normal_indices(faceCounts, faceConnects))
+    assert result is out
+    assert np.array_equal(out, core.vertex_normals(points, faceCounts, faceConnects))
+
+
+def test_colliding_vertices_are_pushed_onto_the_surface():
+    points, normals, weights, colliders, adjacency = build_scenario(("grid", 2500, 3, 0.10, 0.0, 0))
+    result = core.deform(points, normals, weights, colliders)
+    moved = np.flatnonzero((result != points).any(axis=1))
+    assert len(moved)
+    distances = np.min([np.sqrt(((collider.closest_point(result[moved])[0] - result[moved]) ** 2).sum(axis=1))
+                        for collider in colliders], axis=0)
+    assert distances.max() < 1e-9
+
+
+def test_the_bulge_box_cull_drops_no_band_vertex():
+    #every free vertex queried against every pressing collider gives the same result
+    points, normals, weights, colliders, adjacency = build_scenario(("sphere", 3000, 6, 0.10, 0.3, 0))
+    active = np.arange(len(points))
+    contacts = [core.contact_pass(collider, points, active) for collider in colliders]
+    colliding = np.zeros(len(points), dtype=bool)
+    for ids, delta in contacts:
+        colliding[ids] = True
+    free = active[~colliding]
+    bands = [core.band_pass(collider, points, free, 0.3) for collider in colliders]
+    expected = core.resolve(points, normals, weights, contacts, bands, 1.0, 0.3)
+    result = core.deform(points, normals, weights, colliders, 1.0, 0.3)
+    assert (result != points).any()
+    assert np.array_equal(result, expected)
+
+
+def test_inactive_vertices_stay_in_place():
+    #vertices outside the active ids, like the ones outside the deformer set, are never moved
+    scenario = ("grid", 2500, 3, 0.25, 0.2, 2)
+    points, normals, weights, colliders, adjacency = build_scenario(scenario)
+    full = core.deform(points, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 2, adjacency)
+    moved = np.flatnonzero((full != points).any(axis=1))
+    active = moved[::2]
+    result = core.deform(points, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 2, adjacency, active)
+    outside = np.ones(len(points), dtype=bool)
+    outside[active] = False
+    assert np.array_equal(result[outside], points[outside])
+    assert (result[active] != points[active]).any()
+
+
+def test_smoothing_averages_the_undeformed_neighbours():
+    #the original node moved every colliding vertex halfway towards the average
+    #of its neighbours on the input mesh, for every iteration
+    scenario = ("grid", 900, 2, 0.25, 0.2, 3)
+    points, normals, weights, colliders, adjacency = build_scenario(scenario)
+    unsmoothed = core.deform(points, normals, weights, colliders, 0.8, 0.2)
+    result = core.deform(points, normals, weights, colliders, 0.8, 0.2, 1.0, core.bulge_ramp, 3, adjacency)
+    expected = unsmoothed.copy()
+    for index in np.flatnonzero((unsmoothed != points).any(axis=1)):
+        average = points[adjacency.neighbours(index)].mean(axis=0)
+        for smoothIt in range(3):
+            expected[index] -= (expected[index] - average) * 0.5 * 0.8
+    assert np.allclose(result, expected, rtol=0.0, atol=1e-12)
+
+
+def test_zero_weights_stay_in_place():
+    points, normals, weights, colliders, adjacency = build_scenario(("grid", 2500, 3, 0.25, 0.2, 1))
+    weights[::3] = 0.0
+    result = core.deform(points, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 1, adjacency)
+    assert np.array_equal(result[::3], points[::3])
+
+
+def test_float32_buffers_match_float64():
+    scenario = ("grid", 2500, 3, 0.10, 0.1, 1)
+    points, normals, weights, colliders, adjacency = build_scenario(scenario)
+    #the colliders sit on grid vertices, so the vertices on their symmetry planes
+    #have two equally close collider points. The jitter breaks those ties
+    points = points + np.random.RandomState(1).uniform(-0.004, 0.004, points.shape) * [1.0, 1.0, 0.0]
+    expected = core.deform(points, normals, weights, colliders, 1.0, 0.1, 1.0, core.bulge_ramp, 1, adjacency)
+    buffers = DeformBuffers()
+    buffers.resize(len(points), "float32")
+    buffers.points[:] = points
+    result = core.deform(buffers.points, normals.astype(np.float32), weights.astype(np.float32), colliders, 1.0,
+                         0.1, 1.0, core.bulge_ramp, 1, adjacency, None, 1, None, buffers.result)
+    assert result is buffers.result
+    assert result.dtype == np.float32
+    assert np.abs(result - expected).max() < 1e-4
@@ -0,0 +1,70 @@
+import numpy as np
+
+from ny_collision import core
+from ny_collision.benchmark import build_scenario, sphere_mesh
+from ny_collision.incremental import IncrementalDeformer
+from ny_collision.primitives import SphereCollider
+from ny_collision.sdf import RigidCollider
+
+SCENARIO = ("grid", 2500, 3, 0.25, 0.2, 2)
+
+
+def frames(points, colliders, count=6):
+    #the first collider slides, a patch of vertices ripples, the rest stays put
+    rest = [collider.points.copy() for collider in colliders]
+    patch = np.flatnonzero(points[:, 0] < -0.8)
+    for frame in range(count):
+        for collider, colPoints in zip(colliders[:1], rest):
+            collider.update(colPoints + [0.03 * frame, 0.0, 0.0])
+        moved = points.copy()
+        moved[patch, 2] += 0.01 * np.sin(frame + points[patch, 1] * 5)
+        yield moved
+
+
+def test_incremental_matches_full_evaluation():
+    points, normals, weights, colliders, adjacency = build_scenario(SCENARIO)
+    evaluator = IncrementalDeformer()
+    for framePoints in frames(points, colliders):
+        expected = core.deform(framePoints, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 2, adjacency)
+        result = evaluator.deform(framePoints, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 2,
+                                  adjacency)
+        assert np.array_equal(result, expected)
+    assert evaluator.incrementalEvaluations
+
+
+def test_incremental_matches_full_evaluation_with_primitives():
+    points, normals, weights, colliders, adjacency = build_scenario(SCENARIO)
+    evaluator = IncrementalDeformer()
+    for frame in range(5):
+        matrix = np.eye(4)
+        matrix[3, :3] = (-0.4 + 0.1 * frame, 0.2, 0.25)
+        sphere = SphereCollider(matrix, 0.35)
+        expected = core.deform(points, normals, weights, colliders + [sphere], 1.0, 0.2)
+        result = evaluator.deform(points, normals, weights, colliders + [sphere], 1.0, 0.2)
+        assert np.array_equal(result, expected)
+
+
+def test_rebuilt_rigid_collider_is_queried_again():
+    #a field rebuilt from new local points keeps the matrix and the bounding box
+    points, normals, weights, colliders, adjacency = build_scenario(SCENARIO)
+    sphere = sphere_mesh(800)
+    triangles = core.triangulate(sphere[1], sphere[2])
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.0, 0.0, 0.3)
+    bboxMin, bboxMax = np.array([-0.6, -0.6, -0.6]), np.array([0.6, 0.6, 1.2])
+    evaluator = IncrementalDeformer()
+    for scale in (0.5, 0.6):
+        rigid = RigidCollider(sphere[0] * scale, triangles, matrix, 0.2, 24)
+        rigid.set_matrix(matrix, bboxMin, bboxMax)
+        result = evaluator.deform(points, normals, weights, [rigid], 1.0, 0.2)
+    assert np.array_equal(result, core.deform(points, normals, weights, [rigid], 1.0, 0.2))
+
+
+def test_threshold_falls_back_to_a_full_evaluation():
+    points, normals, weights, colliders, adjacency = build_scenario(SCENARIO)
+    evaluator = IncrementalDeformer(threshold=0.1)
+    evaluator.deform(points, normals, weights, colliders, 1.0, 0.2)
+    shifted = points + [0.0, 0.0, 0.01]
+    result = evaluator.deform(shifted, normals, weights, colliders, 1.0, 0.2)
+    assert evaluator.fullEvaluations == 2
+    assert np.array_equal(result, core.deform(shifted, normals, weights, colliders, 1.0, 0.2))
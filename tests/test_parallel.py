@@ -0,0 +1,50 @@
+import numpy as np
+
+from ny_collision import core, parallel
+from ny_collision.benchmark import build_scenario
+from ny_collision.incremental import IncrementalDeformer
+
+
+def small_chunks(monkeypatch):
+    #chunks small enough that a test mesh is split over every worker
+    monkeypatch.setattr(parallel, "MIN_CHUNK", 64)
+
+
+def test_deform_is_bit_identical_for_any_worker_count(monkeypatch):
+    small_chunks(monkeypatch)
+    points, normals, weights, colliders, adjacency = build_scenario(("sphere", 5000, 8, 0.25, 0.2, 3))
+    expected = core.deform(points, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 3, adjacency)
+    for workers in (2, 3, 8, 0):
+        result = core.deform(points, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 3, adjacency,
+                             None, workers)
+        assert np.array_equal(result, expected)
+
+
+def test_incremental_is_bit_identical_for_any_worker_count(monkeypatch):
+    small_chunks(monkeypatch)
+    points, normals, weights, colliders, adjacency = build_scenario(("grid", 5000, 4, 0.25, 0.2, 2))
+    evaluators = dict((workers, IncrementalDeformer()) for workers in (1, 2, 4))
+    for frame in range(3):
+        framePoints = points + [0.0, 0.0, 0.005 * frame]
+        results = [evaluator.deform(framePoints, normals, weights, colliders, 1.0, 0.2, 1.0, core.bulge_ramp, 2,
+                                    adjacency, None, workers)
+                   for workers, evaluator in evaluators.items()]
+        for result in results[1:]:
+            assert np.array_equal(result, results[0])
+
+
+def test_smoothing_is_bit_identical_for_any_worker_count(monkeypatch):
+    small_chunks(monkeypatch)
+    points, normals, weights, colliders, adjacency = build_scenario(("grid", 5000, 1, 0.10, 0.0, 0))
+    noisy = points + np.random.RandomState(0).normal(0.0, 0.01, points.shape)
+    mask = np.zeros(len(points), dtype=bool)
+    mask[::3] = True
+    expected = adjacency.smooth(noisy, mask, 4)
+    for workers in (2, 5):
+        assert np.array_equal(adjacency.smooth(noisy, mask, 4, 1.0, workers), expected)
+
+
+def test_chunks_cover_the_ids_in_order():
+    ids = np.arange(100000)
+    for workers in (1, 3, 16):
+        assert np.array_equal(np.concatenate(parallel.split(ids, workers)), ids)
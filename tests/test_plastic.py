@@ -0,0 +1,92 @@
+import numpy as np
+
+from ny_collision import core
+from ny_collision.benchmark import build_scenario
+from ny_collision.plastic import Checkpoints, OffsetBuffer, PlasticDeformer, plastic_step
+
+START = 1
+END = 24
+
+
+class Scene(object):
+    #a collider pressing into a grid and sliding across it, one step per frame
+    def __init__(self):
+        self.points, self.normals, self.weights, colliders, self.adjacency = build_scenario(
+            ("grid", 900, 1, 0.05, 0.1, 1))
+        self.collider = colliders[0]
+        self.rest = self.collider.points.copy()
+
+    def elastic(self, frame):
+        self.collider.update(self.rest + [0.05 * (frame - START), 0.0, 0.0])
+        return self.points, core.deform(self.points, self.normals, self.weights, [self.collider], 1.0, 0.1, 1.0,
+                                        core.bulge_ramp, 1, self.adjacency)
+
+    def evaluate(self, plastic, frame):
+        points, result = self.elastic(frame)
+        return plastic.deform(frame, points, result, self.elastic)
+
+
+def sequential(scene):
+    plastic = PlasticDeformer(START)
+    return dict((frame, scene.evaluate(plastic, frame)) for frame in range(START, END + 1))
+
+
+def test_dents_stay_after_the_collider_leaves():
+    scene = Scene()
+    results = sequential(scene)
+    elastic = scene.elastic(END)[1]
+    dented = (results[END] != elastic).any(axis=1)
+    assert dented.any()
+
+
+def test_replay_equals_sequential_evaluation():
+    scene = Scene()
+    expected = sequential(scene)
+    plastic = PlasticDeformer(START, interval=5)
+    for frame in (END, 7, 19, 3, END, 12):
+        assert np.array_equal(scene.evaluate(plastic, frame), expected[frame])
+    assert plastic.replayedFrames
+
+
+def test_replay_equals_sequential_evaluation_with_few_compressed_checkpoints():
+    scene = Scene()
+    expected = sequential(scene)
+    plastic = PlasticDeformer(START, interval=2, maxBytes=4096, compress=True)
+    for frame in range(START, END + 1):
+        scene.evaluate(plastic, frame)
+    assert plastic.checkpoints.nbytes <= 4096
+    for frame in (15, 4, END):
+        assert np.array_equal(scene.evaluate(plastic, frame), expected[frame])
+
+
+def test_a_new_key_discards_the_history():
+    scene = Scene()
+    plastic = PlasticDeformer(START, interval=2)
+    plastic.configure("first", START, 2)
+    for frame in range(START, 10):
+        scene.evaluate(plastic, frame)
+    assert len(plastic.checkpoints)
+    plastic.configure("second", START, 2)
+    assert not len(plastic.checkpoints)
+    assert plastic.frame is None
+
+
+def test_plastic_step_keeps_the_larger_offset():
+    points = np.zeros((4, 3))
+    previous = OffsetBuffer(4, [1, 2], [[0.0, 0.0, -0.5], [0.0, 0.0, -0.1]])
+    result = points + [[0.0, 0.0, 0.0], [0.0, 0.0, -0.2], [0.0, 0.0, -0.3], [0.2, 0.0, 0.0]]
+    state = plastic_step(previous, points, result)
+    assert np.array_equal(state.ids, [1, 2, 3])
+    assert np.allclose(state.apply(points), [[0.0, 0.0, 0.0], [0.0, 0.0, -0.5], [0.0, 0.0, -0.3], [0.2, 0.0, 0.0]])
+
+
+def test_checkpoints_stay_spread_over_the_timeline():
+    buffer = OffsetBuffer(100, np.arange(50), np.ones((50, 3)))
+    size = len(buffer.pack()[3])
+    checkpoints = Checkpoints(interval=1, maxBytes=size * 4)
+    for frame in range(1, 41):
+        checkpoints.store(frame, buffer)
+    assert len(checkpoints) == 4
+    assert checkpoints.frames[0] == 1 and checkpoints.frames[-1] == 40
+    assert checkpoints.nearest(0) is None
+    assert checkpoints.nearest(40)[0] == 40
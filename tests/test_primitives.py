@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from ny_collision import core
+from ny_collision.benchmark import build_scenario, sphere_mesh
+from ny_collision.primitives import PRIMITIVE_TYPES, primitive_collider
+
+
+def collider_matrix(scale=(1.0, 1.0, 1.0)):
+    #rotated about every axis, scaled and moved away from the origin
+    angles = np.radians([20.0, 35.0, -50.0])
+    matrix = np.eye(4)
+    rotation = np.eye(3)
+    for axis, angle in enumerate(angles):
+        turn = np.eye(3)
+        first, second = [index for index in range(3) if index != axis]
+        turn[first, first] = turn[second, second] = np.cos(angle)
+        turn[first, second] = np.sin(angle)
+        turn[second, first] = -np.sin(angle)
+        rotation = np.dot(rotation, turn)
+    matrix[:3, :3] = rotation * np.asarray(scale)[:, None]
+    matrix[3, :3] = (1.5, -0.5, 2.0)
+    return matrix
+
+
+def samples(count=3000):
+    return np.random.RandomState(0).uniform(-3.0, 3.0, (count, 3)) + [1.5, -0.5, 2.0]
+
+
+def local(points, matrix):
+    #points in the collider's unscaled local space
+    rotation = matrix[:3, :3] / np.sqrt((matrix[:3, :3] ** 2).sum(axis=1))[:, None]
+    return np.dot(points - matrix[3, :3], rotation.T)
+
+
+def lengths(vectors):
+    return np.sqrt((vectors * vectors).sum(axis=-1))
+
+
+def test_sphere_queries():
+    matrix = collider_matrix((2.0, 2.0, 2.0))
+    sphere = primitive_collider("sphere", matrix, 0.75)
+    points = samples()
+    closest, normal, inside = sphere.query(points)
+    offset = points - matrix[3, :3]
+    assert np.array_equal(inside, lengths(offset) < 1.5)
+    assert np.allclose(lengths(closest - matrix[3, :3]), 1.5)
+    assert np.allclose(normal, offset / lengths(offset)[:, None])
+
+
+def test_capsule_queries():
+    matrix = collider_matrix()
+    capsule = primitive_collider("capsule", matrix, 0.5, 2.0)
+    points = samples()
+    closest, normal, inside = capsule.query(points)
+    localPoints = local(points, matrix)
+    axis = np.zeros_like(localPoints)
+    axis[:, 1] = np.clip(localPoints[:, 1], -1.0, 1.0)
+    distance = lengths(localPoints - axis)
+    assert np.array_equal(inside, distance < 0.5)
+    assert np.allclose(lengths(points - closest), np.abs(distance - 0.5))
+    assert np.allclose(lengths(normal), 1.0)
+
+
+def test_box_queries():
+    matrix = collider_matrix((1.0, 2.0, 1.0))
+    box = primitive_collider("box", matrix, size=(1.0, 1.5, 2.0))
+    extent = np.array([0.5, 1.5, 1.0])
+    points = samples()
+    closest, normal, inside = box.query(points)
+    localPoints = local(points, matrix)
+    assert np.array_equal(inside, (np.abs(localPoints) < extent).all(axis=1))
+    #outside points go to the nearest point of the box, inside ones leave through the nearest side
+    outside = ~inside
+    assert np.allclose(local(closest[outside], matrix), np.clip(localPoints[outside], -extent, extent))
+    room = (extent - np.abs(localPoints[inside])).min(axis=1)
+    assert np.allclose(lengths(points[inside] - closest[inside]), room)
+    assert (np.abs(local(closest, matrix)) >= extent - 1e-9).any(axis=1).all()
+
+
+def test_plane_queries():
+    matrix = collider_matrix()
+    plane = primitive_collider("plane", matrix)
+    points = samples()
+    closest, normal, inside = plane.query(points)
+    up = matrix[1, :3] / lengths(matrix[1, :3])
+    height = np.dot(points - matrix[3, :3], up)
+    assert np.array_equal(inside, height < 0)
+    assert np.allclose(np.dot(closest - matrix[3, :3], up), 0.0)
+    assert np.allclose(normal, up)
+
+
+@pytest.mark.parametrize("kind", ["sphere", "capsule", "box"])
+def test_closest_points_are_within_the_bounds(kind):
+    collider = primitive_collider(kind, collider_matrix((1.0, 1.5, 0.5)), 0.75, 1.0, (1.0, 2.0, 0.5))
+    boundMin, boundMax = collider.bounds()
+    closest = collider.query(samples())[0]
+    assert (closest >= boundMin - 1e-9).all() and (closest <= boundMax + 1e-9).all()
+
+
+def test_primitives_push_vertices_out_like_a_mesh():
+    #a sphere primitive and a dense sphere mesh give nearly the same dent
+    points, normals, weights, colliders, adjacency = build_scenario(("grid", 2500, 1, 0.1, 0.0, 0))
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.0, 0.0, 0.4)
+    sphere = primitive_collider("sphere", matrix, 0.5)
+    spherePoints, faceCounts, faceConnects = sphere_mesh(5000)
+    mesh = core.MeshCollider(spherePoints * 0.5 + matrix[3, :3], core.triangulate(faceCounts, faceConnects))
+    analytic = core.deform(points, normals, weights, [sphere])
+    meshed = core.deform(points, normals, weights, [mesh])
+    assert (analytic != points).any()
+    assert np.abs(analytic - meshed).max() < 0.01
+
+
+def test_primitive_types_by_index_and_name():
+    for index, name in enumerate(PRIMITIVE_TYPES):
+        assert type(primitive_collider(index, np.eye(4))) is type(primitive_collider(name, np.eye(4)))
+    with pytest.raises(ValueError):
+        primitive_collider("cone", np.eye(4))
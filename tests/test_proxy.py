@@ -0,0 +1,66 @@
+import numpy as np
+
+from ny_collision import core
+from ny_collision.benchmark import sphere_mesh
+from ny_collision.proxy import ProxyCollider
+
+MAX_ERROR = 0.1
+
+
+def dense_sphere():
+    points, faceCounts, faceConnects = sphere_mesh(20000)
+    return points, core.triangulate(faceCounts, faceConnects)
+
+
+def distances(collider, points):
+    closest = collider.closest_point(points)[0]
+    return np.sqrt(((closest - points) ** 2).sum(axis=1))
+
+
+def test_proxy_is_smaller_than_the_mesh():
+    points, triangles = dense_sphere()
+    proxy = ProxyCollider(points, triangles, MAX_ERROR)
+    assert len(proxy.proxy.triangles) < len(triangles) / 3
+
+
+def test_every_vertex_is_within_the_error_of_the_proxy():
+    points, triangles = dense_sphere()
+    proxy = ProxyCollider(points, triangles, MAX_ERROR)
+    assert distances(proxy, points).max() <= MAX_ERROR
+    #no vertex is further than the error from the point its cluster collapsed to
+    drift = points - proxy.proxy.points[proxy.clusters]
+    assert np.sqrt((drift * drift).sum(axis=1)).max() <= MAX_ERROR
+
+
+def test_the_bound_holds_while_the_collider_deforms():
+    points, triangles = dense_sphere()
+    proxy = ProxyCollider(points, triangles, MAX_ERROR)
+    for frame in range(1, 6):
+        #stretches the sphere further every frame
+        deformed = points * [1.0 + 0.5 * frame, 1.0, 1.0 - 0.1 * frame]
+        proxy.update(deformed)
+        assert distances(proxy, deformed).max() <= MAX_ERROR
+    assert proxy.rebuilds > 1
+
+
+def test_exact_pushout_matches_the_full_mesh():
+    points, triangles = dense_sphere()
+    proxy = ProxyCollider(points, triangles, MAX_ERROR, exact=True)
+    mesh = core.MeshCollider(points, triangles)
+    rng = np.random.RandomState(0)
+    samples = rng.normal(size=(3000, 3))
+    samples *= (rng.uniform(0.8, 1.05, len(samples)) / np.sqrt((samples * samples).sum(axis=1)))[:, None]
+    closest, normal, inside = proxy.query(samples)
+    meshClosest, meshNormal, meshInside = mesh.query(samples)
+    assert np.array_equal(inside, meshInside)
+    assert np.array_equal(closest[inside], meshClosest[inside])
+
+
+def test_the_full_mesh_is_only_kept_while_asked_for():
+    points, triangles = dense_sphere()
+    proxy = ProxyCollider(points, triangles, MAX_ERROR)
+    assert proxy.exact is None
+    proxy.set_exact(True)
+    assert proxy.exact is not None
+    proxy.set_exact(False)
+    assert proxy.exact is None
@@ -0,0 +1,79 @@
+import numpy as np
+
+from ny_collision import ramp
+from ny_collision.ramp import RampTable
+
+
+class Sampler(object):
+    #a smooth bump like the default bulge ramp, counting the positions it is asked for
+    def __init__(self):
+        self.samples = 0
+
+    def __call__(self, positions):
+        self.samples += len(positions)
+        return np.sin(np.asarray(positions) * np.pi) ** 2 * 0.9
+
+
+def test_the_table_is_within_the_tolerance_of_the_ramp():
+    sampler = Sampler()
+    table = RampTable(0.0001)
+    table.update("bump", sampler)
+    positions = np.random.RandomState(0).rand(10000)
+    assert np.abs(table(positions) - sampler(positions)).max() <= 0.0001
+    assert len(table.samplePositions) < ramp.MAX_RESOLUTION + 1
+
+
+def test_the_ramp_is_only_sampled_again_when_its_key_changes():
+    sampler = Sampler()
+    table = RampTable()
+    assert table.update("first", sampler)
+    samples = sampler.samples
+    assert not table.update("first", sampler)
+    assert sampler.samples == samples
+    assert table.update("second", sampler)
+    assert sampler.samples > samples
+
+
+def test_a_new_tolerance_samples_the_ramp_again():
+    sampler = Sampler()
+    table = RampTable(0.01)
+    table.update("bump", sampler)
+    coarse = len(table.samplePositions)
+    assert table.update("bump", sampler, 0.00001)
+    assert len(table.samplePositions) > coarse
+
+
+def test_steps_stop_at_the_largest_resolution():
+    table = RampTable()
+    table.update("step", lambda positions: (np.asarray(positions) > 0.3).astype(np.float64))
+    assert len(table.samplePositions) == ramp.MAX_RESOLUTION + 1
+    assert np.array_equal(table([0.0, 0.2, 0.5, 1.0]), [0.0, 0.0, 1.0, 1.0])
+
+
+def test_ramp_curves_go_through_their_entries():
+    entries = [(0.0, 0.0, "spline"), (0.25, 0.9, "spline"), (0.6, 0.4, "smooth"), (1.0, 0.1, "linear")]
+    curve = ramp.ramp_curve(entries)
+    assert np.allclose(curve([0.0, 0.25, 0.6, 1.0]), [0.0, 0.9, 0.4, 0.1])
+    #the first and the last value are held outside the entries
+    assert np.allclose(curve([-1.0, 2.0]), [0.0, 0.1])
+
+
+def test_each_entry_shapes_the_segment_after_it():
+    positions = np.linspace(0.0, 1.0, 101)
+    linear = ramp.ramp_curve([(0.0, 0.0, "linear"), (0.5, 1.0, "linear"), (1.0, 0.2, "linear")])
+    assert np.allclose(linear(positions), np.interp(positions, [0.0, 0.5, 1.0], [0.0, 1.0, 0.2]))
+    step = ramp.ramp_curve([(0.0, 0.0, "none"), (0.5, 1.0, 0)])
+    assert np.array_equal(step([0.0, 0.49, 0.5, 0.8]), [0.0, 0.0, 1.0, 1.0])
+    smooth = ramp.ramp_curve([(0.0, 0.0, "smooth"), (1.0, 1.0, "smooth")])
+    assert np.allclose(smooth(positions), positions * positions * (3.0 - 2.0 * positions))
+
+
+def test_splines_bend_through_the_neighbouring_entries():
+    #past its peak the default bulge ramp falls off slowly, then faster than its straight line
+    curve = ramp.ramp_curve([(0.0, 0.0, "spline"), (0.25, 0.9, "spline"), (1.0, 0.0, "spline")])
+    positions = np.linspace(0.3, 0.95, 14)
+    values = curve(positions)
+    straight = np.interp(positions, [0.0, 0.25, 1.0], [0.0, 0.9, 0.0])
+    assert (values[positions < 0.7] > straight[positions < 0.7]).all()
+    assert (values[positions > 0.8] < straight[positions > 0.8]).all()
+    assert (values <= 0.9).all() and (np.diff(values) < 0).all()
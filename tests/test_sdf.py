@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from ny_collision import core
+from ny_collision.benchmark import sphere_mesh
+from ny_collision.sdf import RigidCollider
+
+BAND = 0.2
+
+
+def collider_matrix():
+    angle = np.radians(30.0)
+    matrix = np.eye(4)
+    matrix[:3, :3] = [[np.cos(angle), 0.0, -np.sin(angle)], [0.0, 1.0, 0.0], [np.sin(angle), 0.0, np.cos(angle)]]
+    matrix[3, :3] = (0.5, -0.25, 1.0)
+    return matrix
+
+
+@pytest.fixture(scope="module")
+def colliders():
+    #the same squashed sphere as a rigid field and as a plain BVH collider in world space
+    points, faceCounts, faceConnects = sphere_mesh(1200)
+    points = points * [1.0, 0.6, 0.8]
+    triangles = core.triangulate(faceCounts, faceConnects)
+    rigid = RigidCollider(points, triangles, collider_matrix(), BAND)
+    mesh = core.MeshCollider(core.transform_points(points, collider_matrix()), triangles)
+    return rigid, mesh
+
+
+def samples(mesh, count=4000):
+    #points scattered around the surface, from deep inside to beyond the band
+    rng = np.random.RandomState(0)
+    surface = mesh.points[rng.randint(len(mesh.points), size=count)]
+    directions = rng.normal(size=(count, 3))
+    directions /= np.sqrt((directions * directions).sum(axis=1))[:, None]
+    return surface + directions * rng.uniform(0.0, 0.5, count)[:, None]
+
+
+def test_inside_flags_agree_with_the_bvh(colliders):
+    rigid, mesh = colliders
+    points = samples(mesh)
+    assert np.array_equal(rigid.query(points)[2], mesh.query(points)[2])
+
+
+def test_closest_points_within_the_band_agree_with_the_bvh(colliders):
+    rigid, mesh = colliders
+    points = samples(mesh)
+    meshClosest = mesh.closest_point(points)[0]
+    meshDistance = np.sqrt(((meshClosest - points) ** 2).sum(axis=1))
+    rigidClosest = rigid.query(points)[0]
+    near = meshDistance < BAND
+    assert near.any()
+    error = np.sqrt(((rigidClosest[near] - points[near]) ** 2).sum(axis=1)) - meshDistance[near]
+    #the walk over neighbouring triangles can stop a little short of the closest one
+    assert error.min() > -1e-12
+    assert (error < 1e-9).mean() > 0.99
+    assert error.max() < 1e-3
+
+
+def test_moving_the_matrix_moves_the_queries(colliders):
+    rigid, mesh = colliders
+    points = samples(mesh)
+    offset = np.eye(4)
+    offset[3, :3] = (0.3, 0.1, -0.2)
+    rigid.set_matrix(np.dot(collider_matrix(), offset))
+    try:
+        moved = core.MeshCollider(mesh.points + offset[3, :3], mesh.triangles)
+        assert np.array_equal(rigid.query(points)[2], moved.query(points)[2])
+    finally:
+        rigid.set_matrix(collider_matrix())
+
+
+def test_moved_copies_share_the_field_and_keep_their_own_matrix(colliders):
+    rigid, mesh = colliders
+    points = samples(mesh)
+    offset = np.eye(4)
+    offset[3, :3] = (0.3, 0.1, -0.2)
+    moved = rigid.moved(np.dot(collider_matrix(), offset))
+    assert moved.field is rigid.field
+    assert np.array_equal(rigid.matrix, collider_matrix())
+    shifted = core.MeshCollider(mesh.points + offset[3, :3], mesh.triangles)
+    assert np.array_equal(moved.query(points)[2], shifted.query(points)[2])
+    assert np.array_equal(rigid.query(points)[2], mesh.query(points)[2])
+
+
+def far_matrix(angle):
+    #a rigid collider a few hundred units from the origin
+    angle = np.radians(angle)
+    matrix = np.eye(4)
+    matrix[:3, :3] = [[np.cos(angle), np.sin(angle), 0.0], [-np.sin(angle), np.cos(angle), 0.0], [0.0, 0.0, 1.0]]
+    matrix[3, :3] = (300.0, 20.0, -150.0)
+    return matrix
+
+
+def test_far_rigid_colliders_match_their_float32_world_points():
+    points, faceCounts, faceConnects = sphere_mesh(400)
+    triangles = core.triangulate(faceCounts, faceConnects)
+    #the node reads the world points of the mesh in float32 and builds from them
+    world = core.transform_points(points, far_matrix(0.0)).astype(np.float32)
+    rigid = RigidCollider(core.transform_points(world, np.linalg.inv(far_matrix(0.0))), triangles,
+                          far_matrix(0.0), BAND, 16)
+    for angle in (0.0, 10.0, 45.0, 170.0):
+        world = core.transform_points(points, far_matrix(angle)).astype(np.float32)
+        assert rigid.matches(world, far_matrix(angle))
+    dented = world.copy()
+    dented[0] += 0.05
+    assert not rigid.matches(dented, far_matrix(170.0))